@@ -0,0 +1,180 @@
+"""Write throughput of parallel comment posting.
+
+Every thread logs in as its own user and posts comments through the
+Django test client, each request on the thread's own database
+connection, for ``--duration`` seconds. The report shows comments per
+second, latency percentiles and failed requests ("database is locked").
+
+``--compare`` runs every database profile in a child process configured
+through the same ``DB_*`` environment variables as the settings:
+
+    python -m benchmarks.concurrency --threads 8
+    python -m benchmarks.concurrency --compare
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from . import BASE_DIR, setup_django
+from .run import percentiles
+
+# name -> environment of the child process
+PROFILES = {
+    'stock': {'DB_ENGINE': 'django.db.backends.sqlite3',
+              'DB_CONN_MAX_AGE': '0'},
+    'tuned': {'DB_ENGINE': 'yatube.sqlite'},
+}
+
+
+def post_comments(fixtures, threads, duration):
+    from django.db import connection
+    from django.test import Client
+
+    url = (f'/{fixtures["author"].username}/{fixtures["post"].pk}/'
+           'comment/')
+    clients = []
+    for user in fixtures['users'][:threads]:
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+    connection.close()
+    start = threading.Barrier(threads)
+    results = [None] * threads
+
+    def worker(number):
+        timings, errors = [], 0
+        start.wait()
+        deadline = time.perf_counter() + duration
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = clients[number].post(
+                        url, {'text': f'Комментарий {number}'})
+                    failed = response.status_code != 302
+                except Exception:
+                    failed = True
+                if failed:
+                    errors += 1
+                else:
+                    timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+        results[number] = timings, errors
+
+    workers = [threading.Thread(target=worker, args=(number,))
+               for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    timings = [sample for samples, _ in results for sample in samples]
+    return {
+        'comments_per_s': len(timings) / duration,
+        **percentiles(timings or [0.0]),
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def run(options):
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import (override_settings,
+                                   setup_test_environment,
+                                   teardown_test_environment)
+    from mixer.backend.django import mixer
+
+    from posts.models import Post
+    from yatube.test_runner import TEST_SETTINGS
+
+    # failed requests are counted, not logged with a traceback each
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+    # the tests' cache and task settings, never the site's cache file; they
+    # keep rate limits off too, the harness writes far faster than any
+    # person may
+    bench_settings = override_settings(
+        **TEST_SETTINGS, MEDIA_ROOT=os.path.join(workdir, 'media'),
+        POST_THUMBNAIL_WORKERS=0,
+        REQUEST_METRICS_SLOW_MS=float('inf'))
+    bench_settings.enable()
+    settings.DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(workdir, 'db.sqlite3')}
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        users = mixer.cycle(options.threads + 1).blend(
+            settings.AUTH_USER_MODEL)
+        fixtures = {'users': users[1:], 'author': users[0],
+                    'post': mixer.blend(Post, author=users[0])}
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal = cursor.fetchone()[0]
+        report = post_comments(fixtures, options.threads, options.duration)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        bench_settings.disable()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'engine': settings.DATABASES['default']['ENGINE'],
+            'journal_mode': journal,
+            'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+            **report}
+
+
+def compare(options):
+    reports = {}
+    for name, env in PROFILES.items():
+        command = [sys.executable, '-m', 'benchmarks.concurrency', '--json',
+                   '--threads', str(options.threads),
+                   '--duration', str(options.duration)]
+        output = subprocess.run(command, env={**os.environ, **env},
+                                cwd=BASE_DIR, check=True,
+                                stdout=subprocess.PIPE).stdout
+        reports[name] = json.loads(output)
+    return reports
+
+
+def print_report(name, report):
+    print(f'{name:<6} {report["engine"]} journal={report["journal_mode"]} '
+          f'conn_max_age={report["conn_max_age"]}')
+    print(f'       {report["comments_per_s"]:.1f} comments/s, '
+          f'p50={report["p50"]:.1f} p95={report["p95"]:.1f} '
+          f'p99={report["p99"]:.1f} ms, errors={report["errors"]}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5,
+                        help='seconds of posting')
+    parser.add_argument('--compare', action='store_true',
+                        help='run every profile of PROFILES')
+    parser.add_argument('--json', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.compare:
+        for name, report in compare(options).items():
+            print_report(name, report)
+        return 0
+    report = run(options)
+    if options.json:
+        print(json.dumps(report))
+    else:
+        print_report('run', report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""Latency, query and memory benchmark of the posts views.
+
+Seeds a throw-away database with mixer data, drives every view through
+the Django test client (latency percentiles, queries and peak Python
+memory per request; read views with a warm and a cold cache), then
+hammers the read views through a threaded WSGI server (throughput and
+latency under concurrency). Results are
+compared against a stored baseline, and the exit code is 1 on regression.
+
+    python -m benchmarks.run --posts 5000 --requests 200
+    python -m benchmarks.run --save-baseline
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from . import BASE_DIR, setup_django
+
+BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# name -> (method, path builder, form data builder, needs login)
+SCENARIOS = {
+    'index': ('get', lambda fx: '/', None, False),
+    'group_posts': ('get', lambda fx: f'/group/{fx["group"].slug}/',
+                    None, False),
+    'profile': ('get', lambda fx: f'/{fx["author"].username}/', None, False),
+    'post_view': ('get', lambda fx: (f'/{fx["author"].username}/'
+                                     f'{fx["post"].pk}/'), None, False),
+    'follow_index': ('get', lambda fx: '/follow/', None, True),
+    'new_post': ('post', lambda fx: '/new/',
+                 lambda fx, n: {'text': f'Новая запись {n}'}, True),
+    'add_comment': ('post', lambda fx: (f'/{fx["author"].username}/'
+                                        f'{fx["post"].pk}/comment/'),
+                    lambda fx, n: {'text': f'Комментарий {n}'}, True),
+}
+
+
+def percentile(ordered, share):
+    """Linearly interpolated ``share`` percentile of sorted ``ordered``."""
+    position = (len(ordered) - 1) * share
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return (ordered[lower]
+            + (ordered[upper] - ordered[lower]) * (position - lower))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {'p50': percentile(ordered, 0.5), 'p95': percentile(ordered, 0.95),
+            'p99': percentile(ordered, 0.99)}
+
+
+def run_client(fixtures, requests, warmup=5):
+    """Time every scenario through the test client, one request at a time.
+
+    Read views are measured twice: ``<view>`` with the page cache warm and
+    ``<view>_miss`` with the cache cleared before every request.
+    """
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    anonymous, reader = Client(), Client()
+    reader.force_login(fixtures['reader'])
+    report = {}
+    for name, (method, path, data, login) in SCENARIOS.items():
+        client = reader if login else anonymous
+        url = path(fixtures)
+
+        def call(number):
+            payload = data(fixtures, number) if data else None
+            response = getattr(client, method)(url, payload)
+            assert response.status_code < 400, (name, response.status_code)
+
+        runs = {name: False}
+        if method == 'get':
+            runs[f'{name}_miss'] = True
+        for label, cold in runs.items():
+            cache.clear()
+            for number in range(warmup):
+                call(number)
+            timings, queries = [], []
+            for number in range(requests):
+                if cold:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    call(number)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+            if cold:
+                cache.clear()
+            tracemalloc.start()
+            call(requests)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report[label] = {
+                **percentiles(timings),
+                'queries': max(queries),
+                'peak_kib': peak / 1024,
+            }
+    return report
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def run_load(fixtures, concurrency, duration):
+    """Hammer the read views through a threaded WSGI server."""
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.test import Client
+
+    server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                         server_class=ThreadingWSGIServer,
+                         handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f'http://127.0.0.1:{server.server_port}'
+    reader = Client()
+    reader.force_login(fixtures['reader'])
+    session = reader.cookies[settings.SESSION_COOKIE_NAME].value
+    cookie = f'{settings.SESSION_COOKIE_NAME}={session}'
+    report = {}
+    try:
+        for name, (method, path, data, login) in SCENARIOS.items():
+            if method != 'get':
+                continue
+            request = urllib.request.Request(host + path(fixtures))
+            if login:
+                request.add_header('Cookie', cookie)
+            deadline = time.perf_counter() + duration
+
+            def worker(_):
+                timings = []
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    with urllib.request.urlopen(request) as response:
+                        response.read()
+                    timings.append((time.perf_counter() - started) * 1000)
+                return timings
+
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                timings = [sample for samples in pool.map(
+                    worker, range(concurrency)) for sample in samples]
+            report[name] = {**percentiles(timings),
+                            'rps': len(timings) / duration}
+    finally:
+        server.shutdown()
+        server.server_close()
+    return report
+
+
+def compare(results, baseline, tolerance):
+    """Return human readable regressions of ``results`` over ``baseline``."""
+    regressions = []
+    for section, views in results.items():
+        if not isinstance(views, dict):
+            continue
+        for name, metrics in views.items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            if metrics.get('queries', 0) > old.get('queries', 0):
+                regressions.append(f'{section}/{name}: queries '
+                                   f'{old["queries"]} -> {metrics["queries"]}')
+            if metrics['p95'] > old['p95'] * (1 + tolerance):
+                regressions.append(f'{section}/{name}: p95 '
+                                   f'{old["p95"]:.1f} -> {metrics["p95"]:.1f}'
+                                   ' ms')
+    return regressions
+
+
+def print_report(results):
+    for section, views in results.items():
+        if not isinstance(views, dict):
+            continue
+        print(f'\n[{section}]')
+        for name, metrics in views.items():
+            cells = ', '.join(f'{key}={value:.1f}'
+                              for key, value in metrics.items())
+            print(f'  {name:<18} {cells}')
+    print(f'\nmax RSS: {results["max_rss_kib"]} KiB')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=5)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--follows', type=int, default=200)
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--images', type=float, default=0.1,
+                        help='share of posts with an image')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=50,
+                        help='test client requests per view')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=3,
+                        help='seconds of WSGI load per view, 0 skips it')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 growth over the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import (override_settings,
+                                   setup_test_environment,
+                                   teardown_test_environment)
+
+    from yatube.test_runner import TEST_SETTINGS
+
+    from .seed import seed
+
+    workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+    # the tests' cache and task settings, never the site's cache file; they
+    # keep rate limits off too, the harness writes far faster than any
+    # person may
+    bench_settings = override_settings(
+        **TEST_SETTINGS, MEDIA_ROOT=os.path.join(workdir, 'media'),
+        POST_THUMBNAIL_WORKERS=0)
+    bench_settings.enable()
+    # a file database, the WSGI server threads need their own connections
+    settings.DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(workdir, 'db.sqlite3')}
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        started = time.perf_counter()
+        fixtures = seed(options.users, options.groups, options.posts,
+                        options.follows, options.comments, options.images,
+                        options.seed)
+        print(f'seeded in {time.perf_counter() - started:.1f} s')
+        results = {'client': run_client(fixtures, options.requests)}
+        if options.duration:
+            results['wsgi'] = run_load(fixtures, options.concurrency,
+                                       options.duration)
+        results['max_rss_kib'] = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        bench_settings.disable()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if options.save_baseline:
+        with open(options.baseline, 'w') as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+        print(f'baseline saved to {options.baseline}')
+        return 0
+    if not os.path.exists(options.baseline):
+        return 0
+    with open(options.baseline) as baseline:
+        regressions = compare(results, json.load(baseline),
+                              options.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import io
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from mixer.backend.django import mixer
+from PIL import Image
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def sample_image(name='posts/benchmark.jpg'):
+    """Store one real JPEG that image posts share, return its name."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1280, 914), (70, 130, 180)).save(buffer, 'JPEG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def seed(users=50, groups=5, posts=1000, follows=200, comments=2000,
+         images=0.1, random_seed=0):
+    """Fill the database with mixer data of the requested volume.
+
+    Rows go through ``save()`` so every signal (counters, search index,
+    timelines) runs as it does in production. Return the objects the
+    scenarios address: a reader who follows people, an author, a group
+    and a post.
+    """
+    random.seed(random_seed)
+    mixer.faker.seed_instance(random_seed)
+    people = mixer.cycle(users).blend(User)
+    group_list = mixer.cycle(groups).blend(Group)
+    image = sample_image() if images else ''
+    post_list = [
+        mixer.blend(Post, author=random.choice(people),
+                    group=random.choice(group_list + [None]),
+                    image=image if random.random() < images else '')
+        for _ in range(posts)
+    ]
+    reader, author = people[0], people[1]
+    pairs = {(reader.pk, author.pk)}
+    while len(pairs) < min(follows, users * (users - 1)):
+        user, followed = random.sample(people, 2)
+        pairs.add((user.pk, followed.pk))
+    for user_id, author_id in pairs:
+        Follow.objects.create(user_id=user_id, author_id=author_id)
+    for _ in range(comments):
+        mixer.blend(Comment, post=random.choice(post_list),
+                    author=random.choice(people))
+    post = (Post.objects.filter(author=author).first()
+            or mixer.blend(Post, author=author))
+    return {
+        'reader': reader,
+        'author': author,
+        'group': group_list[0],
+        'post': post,
+    }
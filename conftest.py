@@ -0,0 +1,5 @@
+def pytest_configure():
+    # the settings manage.py test runs with, see yatube.test_runner
+    from django.test import override_settings
+    from yatube.test_runner import TEST_SETTINGS
+    override_settings(**TEST_SETTINGS).enable()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Post, Group, Follow
+from .models import Post, Group, Follow, Task, UserStats
 
 
 @admin.register(Post)
@@ -23,3 +23,18 @@ class FollowAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Follow, FollowAdmin)
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'followers_count',
+                    'following_count', 'comments_count')
+    search_fields = ('user__username',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key', 'status', 'attempts', 'run_at',
+                    'locked_by')
+    list_filter = ('status', 'name')
+    search_fields = ('key', 'last_error')
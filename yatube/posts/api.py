@@ -0,0 +1,194 @@
+"""Read-only JSON API for the mobile clients.
+
+Rows come straight from ``values()`` with only the columns of the
+requested ``?fields=``, no model instances are built. Lists are cursor
+paginated like the HTML feeds (``?cursor=``, ``?limit=``) and answer
+conditional requests with the same version stamps as the pages.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .caching import conditional_page
+from .feeds import follow_feed
+from .models import Comment, Follow, Group, Post
+from .paginators import CursorPaginator
+from .views import (group_scopes, index_scopes, page_author, page_group,
+                    post_scopes, profile_scopes)
+
+MAX_LIMIT = 100
+
+# public field name -> values() path
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+
+CONVERTERS = {
+    'image': lambda name: default_storage.url(name) if name else None,
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def api_view(view):
+    """Answer errors as JSON, the API has no HTML pages."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        except Http404:
+            return JsonResponse({'error': 'Не найдено'}, status=404)
+    return wrapper
+
+
+def selected_fields(request, available):
+    names = [name for name in request.GET.get('fields', '').split(',')
+             if name]
+    unknown = set(names) - available.keys()
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return names or list(available)
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(row, fields, available):
+    item = {}
+    for name in fields:
+        value = row[available[name]]
+        converter = CONVERTERS.get(name)
+        item[name] = converter(value) if converter else value
+    return item
+
+
+def rows(queryset, fields, available, extra=()):
+    """``values()`` of just the columns behind ``fields`` and ``extra``."""
+    return queryset.values(*{available[name] for name in fields}, *extra)
+
+
+def cursor_page(request, queryset, available,
+                ordering=('-pub_date', '-id'), fields=None):
+    fields = fields or selected_fields(request, available)
+    keys = [field.lstrip('-') for field in ordering]
+    paginator = CursorPaginator(rows(queryset, fields, available, keys),
+                                page_size(request), ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(row, fields, available) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def post_page(request, posts):
+    return JsonResponse(cursor_page(request, posts, POST_FIELDS))
+
+
+@api_view
+@conditional_page(index_scopes)
+def posts(request):
+    return post_page(request, Post.objects.for_feed())
+
+
+@api_view
+@conditional_page(group_scopes)
+def group_posts(request, slug):
+    return post_page(request, page_group(request, slug).posts.for_feed())
+
+
+@api_view
+@conditional_page(profile_scopes)
+def profile_posts(request, username):
+    return post_page(request,
+                     page_author(request, username).posts.for_feed())
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    return post_page(request, follow_feed(request.user))
+
+
+@api_view
+@conditional_page(post_scopes)
+def post_detail(request, username, post_id):
+    fields = selected_fields(request, POST_FIELDS)
+    post = get_object_or_404(
+        rows(Post.objects.for_feed(), fields, POST_FIELDS),
+        author__username=username, pk=post_id)
+    comments = Comment.objects.filter(post_id=post_id)
+    return JsonResponse({
+        'post': serialize(post, fields, POST_FIELDS),
+        'comments': cursor_page(request, comments, COMMENT_FIELDS,
+                                ordering=('created', 'id'),
+                                fields=list(COMMENT_FIELDS)),
+    })
+
+
+@api_view
+@conditional_page(post_scopes)
+def post_comments(request, username, post_id):
+    if not Post.objects.filter(author__username=username,
+                               pk=post_id).exists():
+        raise Http404
+    comments = Comment.objects.filter(post_id=post_id)
+    return JsonResponse(cursor_page(request, comments, COMMENT_FIELDS,
+                                    ordering=('created', 'id')))
+
+
+@api_view
+def groups(request):
+    return JsonResponse(cursor_page(request, Group.objects.all(),
+                                    GROUP_FIELDS, ordering=('id',)))
+
+
+@api_view
+@conditional_page(profile_scopes)
+def profile(request, username):
+    author = page_author(request, username)
+    stats = getattr(author, 'stats', None)
+    data = {
+        'username': author.username,
+        'first_name': author.first_name,
+        'last_name': author.last_name,
+        'posts_count': stats.posts_count if stats else 0,
+        'followers_count': stats.followers_count if stats else 0,
+        'following_count': stats.following_count if stats else 0,
+    }
+    if request.user.is_authenticated:
+        data['following'] = Follow.objects.filter(
+            user=request.user, author=author).exists()
+    return JsonResponse(data)
@@ -0,0 +1,20 @@
+from django.urls import path
+
+from . import api, views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.posts, name='posts'),
+    path('export/<str:table>/', views.export, name='export'),
+    path('follow/posts/', api.follow_posts, name='follow_posts'),
+    path('groups/', api.groups, name='groups'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('users/<str:username>/', api.profile, name='profile'),
+    path('users/<str:username>/posts/', api.profile_posts,
+         name='profile_posts'),
+    path('users/<str:username>/posts/<int:post_id>/', api.post_detail,
+         name='post'),
+    path('users/<str:username>/posts/<int:post_id>/comments/',
+         api.post_comments, name='post_comments'),
+]
@@ -0,0 +1,143 @@
+"""Reference counts of the content-addressed post images.
+
+Post signals keep ``Blob.refcount`` in step with ``Post.image``; code
+changing images with ``update()`` or ``bulk_create()`` calls
+``change_refs`` itself or ``recount`` afterwards. ``collect`` deletes the
+blobs no post shows any more, ``dedupe`` moves files stored under their
+uploaded names into blobs.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.views.static import serve as static_serve
+
+from .models import Blob, Post
+from .storage import is_blob
+from .versions import touch
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def blob_storage():
+    return Post._meta.get_field('image').storage
+
+
+def change_refs(name, delta):
+    """Shift the reference count of blob ``name`` in a single UPDATE."""
+    if not is_blob(name):
+        return
+    updated = Blob.objects.filter(name=name).update(
+        refcount=Greatest(F('refcount') + delta, 0))
+    if updated or delta < 0:
+        return
+    storage = blob_storage()
+    size = storage.size(name) if storage.exists(name) else 0
+    _, created = Blob.objects.get_or_create(
+        name=name, defaults={'size': size, 'refcount': delta})
+    if not created:
+        Blob.objects.filter(name=name).update(refcount=F('refcount') + delta)
+
+
+def recount(batch_size=500):
+    """Set every reference count from ``Post.image``, return the changed.
+    """
+    counts = {
+        name: total for name, total in
+        Post.objects.order_by().values('image').annotate(
+            total=Count('pk')).values_list('image', 'total')
+        if is_blob(name)}
+    storage = blob_storage()
+    with transaction.atomic():
+        stored = dict(Blob.objects.values_list('name', 'refcount'))
+        new = [Blob(name=name, refcount=total,
+                    size=storage.size(name) if storage.exists(name) else 0)
+               for name, total in counts.items() if name not in stored]
+        changed = [Blob(name=name, refcount=counts.get(name, 0))
+                   for name, refcount in stored.items()
+                   if refcount != counts.get(name, 0)]
+        Blob.objects.bulk_create(new, batch_size=batch_size,
+                                 ignore_conflicts=True)
+        Blob.objects.bulk_update(changed, ['refcount'],
+                                 batch_size=batch_size)
+    return len(new) + len(changed)
+
+
+def blob_files(directory='posts'):
+    """Names of the blob files and leftover ``.part`` files on disk."""
+    storage = blob_storage()
+    root = storage.path(directory)
+    for path, _, files in os.walk(root):
+        for filename in files:
+            name = os.path.relpath(os.path.join(path, filename),
+                                   storage.location).replace(os.sep, '/')
+            if is_blob(name) or filename.endswith('.part'):
+                yield name
+
+
+def collect(grace=None, dry_run=False):
+    """Delete blobs no post refers to, return ``(files, bytes)`` freed.
+
+    Files younger than ``grace`` seconds (``MEDIA_BLOB_GC_GRACE`` by
+    default) are kept: they may belong to a post being saved right now.
+    """
+    if grace is None:
+        grace = settings.MEDIA_BLOB_GC_GRACE
+    recount()
+    referenced = set(Blob.objects.filter(refcount__gt=0).values_list(
+        'name', flat=True))
+    storage = blob_storage()
+    deadline = time.time() - grace
+    files = freed = 0
+    for name in blob_files():
+        path = storage.path(name)
+        if name in referenced or os.path.getmtime(path) > deadline:
+            continue
+        files += 1
+        freed += os.path.getsize(path)
+        if not dry_run:
+            storage.delete(name)
+            Blob.objects.filter(name=name, refcount=0).delete()
+    return files, freed
+
+
+def dedupe():
+    """Move images stored by name into blobs, return ``(files, bytes)``.
+
+    Every post showing a file is switched to its blob and the file is
+    deleted; the byte count is what the duplicates took.
+    """
+    storage = blob_storage()
+    names = (Post.objects.exclude(image='').exclude(image__isnull=True)
+             .order_by().values_list('image', flat=True).distinct())
+    files = saved = 0
+    for name in [name for name in names if not is_blob(name)]:
+        if not storage.exists(name):
+            continue
+        size = storage.size(name)
+        with storage.open(name) as file:
+            blob = storage.save(name, File(file))
+        existed = Blob.objects.filter(name=blob).exists()
+        posts = Post.objects.filter(image=name)
+        pks = list(posts.values_list('pk', flat=True))
+        posts.update(image=blob)
+        change_refs(blob, len(pks))
+        storage.delete(name)
+        touch(*(f'post:{pk}' for pk in pks))
+        files += 1
+        saved += size if existed else 0
+    if files:
+        touch('feeds')
+    return files, saved
+
+
+def serve(request, path):
+    """Serve a blob under ``MEDIA_URL`` for browsers to keep forever."""
+    response = static_serve(request, path,
+                            document_root=blob_storage().location)
+    response['Cache-Control'] = IMMUTABLE
+    return response
@@ -0,0 +1,192 @@
+"""Whole-page caching for the hot anonymous views.
+
+``cache_view`` replaces ``cache_page``. An entry stays servable for
+``stale_timeout`` seconds after it goes stale, which happens when its
+``timeout`` runs out or a version scope it depends on is touched; while
+one request regenerates it under a lock, every other request gets the
+stale copy instead of recomputing too. Fresh entries are regenerated a
+little early at random, more eagerly the longer the page takes to build
+(the XFetch rule), so hot pages rarely go stale at all.
+
+The recompute cost of every key is kept in the cache next to the entry,
+see ``recompute_cost``.
+
+``conditional_page`` answers conditional requests with 304 from the same
+version stamps, before the view runs at all.
+"""
+import datetime as dt
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .versions import get_versions
+
+LOCK_TIMEOUT = 30
+COST_TIMEOUT = 24 * 60 * 60
+
+HIT = 'hit'
+STALE = 'stale'
+EARLY = 'early'
+MISS = 'miss'
+
+
+def page_key(view, request):
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'view:{view.__name__}:{digest}'
+
+
+def recompute_cost(key):
+    """Recompute count by reason (miss, stale, early) and their seconds."""
+    return cache.get(f'{key}:cost')
+
+
+def is_cacheable(request, response):
+    # a page with a CSRF token or setting cookies belongs to one visitor,
+    # the CSRF cookie is only added by the middleware after the view
+    return (response.status_code == 200 and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED'))
+
+
+def expires_early(entry, now, beta):
+    return now - entry['cost'] * beta * math.log(
+        1 - random.random()) >= entry['expires']
+
+
+def cache_view(timeout, stale_timeout=300, scopes=('feeds',), beta=1.0):
+    """Cache anonymous ``GET`` responses of a view, see module docstring.
+
+    ``scopes`` are ``posts.versions`` scopes whose change makes the page
+    stale before ``timeout``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            key = page_key(view, request)
+            versions = get_versions(scopes)
+            entry = cache.get(key)
+            state = entry_state(entry, versions, beta)
+            if state == HIT:
+                return served(entry, HIT)
+            if not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+                # somebody else is regenerating the page
+                entry = entry or wait_for(key)
+                if entry is None:
+                    return view(request, *args, **kwargs)
+                return served(entry, HIT if state == EARLY else STALE)
+            try:
+                started = time.perf_counter()
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                cost = time.perf_counter() - started
+                if is_cacheable(request, response):
+                    store(key, response, versions, cost, state, timeout,
+                          stale_timeout)
+            finally:
+                cache.delete(f'{key}:lock')
+            response['X-Cache'] = MISS
+            return response
+        return wrapper
+    return decorator
+
+
+def store(key, response, versions, cost, state, timeout, stale_timeout):
+    cache.set(key, {'response': response, 'versions': versions,
+                    'expires': time.time() + timeout, 'cost': cost},
+              timeout + stale_timeout)
+    record_cost(key, cost, state)
+
+
+def entry_state(entry, versions, beta):
+    if entry is None:
+        return MISS
+    now = time.time()
+    if entry['versions'] != versions or now >= entry['expires']:
+        return STALE
+    if expires_early(entry, now, beta):
+        return EARLY
+    return HIT
+
+
+def served(entry, state):
+    response = entry['response']
+    response['X-Cache'] = state
+    return response
+
+
+def wait_for(key):
+    """Poll for an entry another request is building."""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def record_cost(key, seconds, state):
+    cost = recompute_cost(key) or {
+        'recomputes': 0, MISS: 0, STALE: 0, EARLY: 0,
+        'last_seconds': 0, 'max_seconds': 0, 'total_seconds': 0}
+    cost['recomputes'] += 1
+    cost[state] += 1
+    cost['last_seconds'] = seconds
+    cost['max_seconds'] = max(cost['max_seconds'], seconds)
+    cost['total_seconds'] += seconds
+    cache.set(f'{key}:cost', cost, COST_TIMEOUT)
+
+
+def conditional_page(scopes):
+    """``condition()`` with ETag and Last-Modified from version stamps.
+
+    ``scopes(request, **kwargs)`` returns the ``posts.versions`` scopes
+    the page depends on; it must stay cheap, at most a lookup by a unique
+    field, since it runs on every request. The ETag also covers the URL,
+    the user, whose name and links the page shows, and the CSRF cookie,
+    whose token the forms of the page carry and a login rotates.
+    Last-Modified
+    cannot tell users apart, so only anonymous pages get it, and every
+    response varies on the cookie for shared caches.
+    """
+    def stamp(request, *args, **kwargs):
+        if not hasattr(request, '_page_stamp'):
+            versions = get_versions(scopes(request, *args, **kwargs))
+            user = request.user.pk if request.user.is_authenticated else ''
+            csrf = request.META.get('CSRF_COOKIE', '')
+            digest = hashlib.md5(
+                f'{request.get_full_path()}|{user}|{csrf}|'
+                f'{sorted(versions.items())}'.encode())
+            request._page_stamp = (
+                digest.hexdigest(),
+                dt.datetime.fromtimestamp(max(versions.values()),
+                                          dt.timezone.utc))
+        return request._page_stamp
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return stamp(request, *args, **kwargs)[1]
+
+    def decorator(view):
+        conditional = condition(
+            etag_func=lambda *args, **kwargs: stamp(*args, **kwargs)[0],
+            last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def uses_fanout():
+    return settings.FOLLOW_FEED_STRATEGY == 'write'
+
+
+def is_fanned_out(author_id):
+    """Whether posts of ``author_id`` are pushed to followers on write."""
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    return (followers or 0) <= settings.FOLLOW_FEED_FANOUT_LIMIT
+
+
+def follow_feed(user):
+    """Queryset of posts by authors ``user`` follows, newest first."""
+    posts = Post.objects.for_feed()
+    followed = Follow.objects.filter(user=user).values('author_id')
+    if not uses_fanout():
+        return posts.filter(author_id__in=followed)
+    inbox = TimelineEntry.objects.filter(user=user).values('post_id')
+    pulled = followed.filter(
+        author__stats__followers_count__gt=settings.FOLLOW_FEED_FANOUT_LIMIT)
+    return posts.filter(Q(pk__in=inbox) | Q(author_id__in=pulled))
+
+
+def fan_out(post):
+    """Push a new post into the timelines of its author's followers."""
+    if not uses_fanout() or not is_fanned_out(post.author_id):
+        return
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post.pk,
+                       pub_date=post.pub_date) for user_id in followers],
+        batch_size=500, ignore_conflicts=True)
+    for user_id in followers:
+        trim(user_id)
+
+
+def add_author(user_id, author_id):
+    """Backfill a timeline with recent posts of a newly followed author."""
+    if not uses_fanout() or not is_fanned_out(author_id):
+        return
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date').values_list('pk', 'pub_date')[:settings.FOLLOW_FEED_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in recent],
+        batch_size=500, ignore_conflicts=True)
+    trim(user_id)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=author_id).delete()
+
+
+def trim(user_id):
+    """Keep only the newest ``FOLLOW_FEED_SIZE`` entries of a timeline."""
+    size = settings.FOLLOW_FEED_SIZE
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    cutoff = entries.order_by('-pub_date').values_list(
+        'pub_date', flat=True)[size - 1:size]
+    if cutoff:
+        entries.filter(pub_date__lt=cutoff[0]).delete()
+
+
+def rebuild_timeline(user_id):
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True)
+    for author_id in authors:
+        add_author(user_id, author_id)
@@ -1,13 +1,68 @@
 from django import forms
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 
 from .models import Comment, Post
 
 
+def limit_upload_size(to_python):
+    """Refuse files over ``POST_IMAGE_MAX_UPLOAD_SIZE`` in ``to_python``
+    of an image field, before Pillow reads the whole file to verify it."""
+    def wrapper(data):
+        size = getattr(data, 'size', None)
+        if size is not None and size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            limit = settings.POST_IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)
+            raise forms.ValidationError(
+                f'Файл больше {limit} МБ', code='file_too_large')
+        return to_python(data)
+    return wrapper
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the form's own copy of the field, which stays a plain ImageField
+        image = self.fields['image']
+        image.to_python = limit_upload_size(image.to_python)
+
+    def clean_image(self):
+        """Refuse images of too many pixels, from the size in the header
+        Pillow read; oversized files never get this far."""
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        width, height = image.image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Слишком большое разрешение картинки', code='too_many_pixels')
+        return image
+
+    def save(self, commit=True):
+        """Keep a new upload as the original, ``posts.images`` does the rest.
+
+        A cleared image takes its original along, the file is deleted once
+        the post is saved with ``commit``.
+        """
+        image = self.cleaned_data.get('image')
+        original = None
+        if isinstance(image, UploadedFile):
+            self.instance.image_original = image
+            self.instance.image = ''
+            self.instance._process_image = True
+        elif image is False and self.instance.image_original:
+            original = self.instance.image_original.name
+            self.instance.image_original = ''
+        post = super().save(commit)
+        if commit and original:
+            transaction.on_commit(lambda: default_storage.delete(original))
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,151 @@
+"""Processing of post images uploaded through ``PostForm``.
+
+The form only stores the upload, already streamed to a temporary file,
+as the post's ``image_original`` and leaves ``image`` empty, so the
+request returns as soon as the file is on disk. The re-encoding (see
+``posts.imaging``) runs in a pool of ``POST_IMAGE_WORKERS`` processes;
+the pool thread that gets the result saves it as ``image`` and bumps the
+versions of the pages showing the post, which show a placeholder until
+then.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from . import blobs, thumbnails
+from .imaging import EXTENSIONS, reencode
+from .models import Post
+from .storage import is_blob
+from .versions import touch
+
+logger = logging.getLogger(__name__)
+
+ORIGINALS_DIR = 'originals/'
+
+_executor = None
+_lock = threading.Lock()
+
+
+def processed_name(original):
+    """``originals/posts/cat.jpg`` -> ``posts/cat.webp``."""
+    stem = os.path.splitext(os.path.basename(original))[0]
+    return f'posts/{stem}{EXTENSIONS[settings.POST_IMAGE_FORMAT]}'
+
+
+def reencode_options():
+    return {
+        'format': settings.POST_IMAGE_FORMAT,
+        'max_side': settings.POST_IMAGE_MAX_SIDE,
+        'max_bytes': settings.POST_IMAGE_MAX_BYTES,
+        'quality': settings.POST_IMAGE_QUALITY,
+    }
+
+
+def temporary_path():
+    handle, path = tempfile.mkstemp(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    os.close(handle)
+    return path
+
+
+def process(post_id, original):
+    """Re-encode ``original`` of post ``post_id`` right here."""
+    target = temporary_path()
+    try:
+        reencode(default_storage.path(original), target,
+                 **reencode_options())
+        return publish(post_id, original, target)
+    finally:
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def schedule(post_id, original):
+    """Re-encode in the worker pool, or right away without workers."""
+    global _executor
+    if not settings.POST_IMAGE_WORKERS:
+        process(post_id, original)
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.POST_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'))
+    target = temporary_path()
+    future = _executor.submit(reencode, default_storage.path(original),
+                              target, **reencode_options())
+    future.add_done_callback(partial(_finish, post_id, original, target))
+
+
+def _finish(post_id, original, target, future):
+    try:
+        future.result()
+        publish(post_id, original, target)
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', original)
+    finally:
+        if os.path.exists(target):
+            os.remove(target)
+        connection.close()
+
+
+def publish(post_id, original, target):
+    """Store the re-encoded ``target`` as the image of the post.
+
+    Nothing is stored if the post is gone or got another image meanwhile.
+    An image re-encoded before is replaced. Return the name of the stored
+    image or ``None``. A blob left unused is deleted by
+    ``blobs.collect``.
+    """
+    posts = Post.objects.filter(pk=post_id, image_original=original)
+    row = posts.values_list('image', 'author_id', 'group_id').first()
+    if row is None:
+        return None
+    previous, author_id, group_id = row
+    with open(target, 'rb') as file:
+        name = blobs.blob_storage().save(processed_name(original),
+                                         File(file))
+    if not posts.update(image=name):
+        return None
+    blobs.change_refs(name, 1)
+    release(previous)
+    if not settings.POST_IMAGE_KEEP_ORIGINALS:
+        posts.update(image_original='')
+        default_storage.delete(original)
+    scopes = [f'post:{post_id}', f'author:{author_id}', 'feeds']
+    if group_id:
+        scopes.append(f'group-posts:{group_id}')
+    touch(*scopes)
+    thumbnails.schedule(name)
+    return name
+
+
+def adopt(post):
+    """Make the untouched image of an older post its original.
+
+    The file is copied under ``originals/`` and removed from ``posts/``
+    unless another post still shows it. Return the original's name.
+    """
+    name = post.image.name
+    with default_storage.open(name) as file:
+        original = default_storage.save(
+            f'{ORIGINALS_DIR}{name}', File(file))
+    Post.objects.filter(pk=post.pk).update(image='', image_original=original)
+    release(name)
+    return original
+
+
+def release(name):
+    """Drop a reference to an image the post no longer shows."""
+    if is_blob(name):
+        blobs.change_refs(name, -1)
+    elif name and not Post.objects.filter(image=name).exists():
+        default_storage.delete(name)
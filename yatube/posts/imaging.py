@@ -0,0 +1,54 @@
+"""Re-encoding of uploaded images, run in the worker processes.
+
+Only Pillow is used here: the workers are spawned fresh and never set up
+Django, so this module must not import it.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg'}
+MIN_QUALITY = 40
+QUALITY_STEP = 10
+
+
+def reencode(source, target, format='WEBP', max_side=1600, max_bytes=None,
+             quality=80):
+    """Write ``source`` to ``target`` shrunk to fit the caps.
+
+    The image is turned upright by its EXIF orientation, scaled down to
+    ``max_side`` pixels on its longest side and saved without EXIF, XMP
+    or comments, keeping only the colour profile. The quality is lowered
+    step by step until the file fits in ``max_bytes``. Animated images
+    keep their first frame. Return ``(width, height, bytes)``.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = flattened(image, format)
+        options = {'icc_profile': image.info.get('icc_profile')}
+        if format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options.update(method=4)
+        while True:
+            image.save(target, format, quality=quality, **options)
+            size = os.path.getsize(target)
+            if (max_bytes is None or size <= max_bytes
+                    or quality <= MIN_QUALITY):
+                return image.width, image.height, size
+            quality -= QUALITY_STEP
+
+
+def flattened(image, format):
+    """``image`` in a mode ``format`` can store, alpha kept for WebP."""
+    has_alpha = (image.mode in ('RGBA', 'LA', 'PA')
+                 or 'transparency' in image.info)
+    if not has_alpha:
+        return image if image.mode in ('RGB', 'L') else image.convert('RGB')
+    image = image.convert('RGBA')
+    if format != 'JPEG':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
@@ -0,0 +1,262 @@
+"""Bulk import of posts, comments and follows from NDJSON or CSV.
+
+Rows are inserted with ``bulk_create``, one transaction per chunk, so no
+model signals run: authors and groups are resolved by username and slug
+from maps loaded once, and the counters, search index and timelines the
+signals would keep are rebuilt by ``rebuild_denormalized`` afterwards.
+Images named in the rows are copied into ``MEDIA_ROOT/posts/`` by a
+thread pool while the chunk is being prepared.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .blobs import blob_storage, recount
+from .feeds import rebuild_timeline, uses_fanout
+from .models import Comment, Follow, Group, Post, User
+from .search import get_backend
+from .stats import rebuild_stats
+from .versions import touch
+
+FORMATS = ('ndjson', 'csv')
+MAX_ERRORS = 20
+
+
+class ImportDataError(ValueError):
+    pass
+
+
+def read_rows(file, format):
+    """Dicts of the rows in ``file``, a text file of ``format``."""
+    if format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield {'_error': 'неверный JSON'}
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ImportDataError(f'неверная дата {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+@contextmanager
+def keep_dates(model):
+    """Let ``bulk_create`` store given dates of ``auto_now_add`` fields."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Import rows of one table, see module docstring.
+
+    ``imported`` and ``skipped`` count rows so far, ``errors`` keeps the
+    first ``MAX_ERRORS`` ``(row number, message)`` pairs of skipped rows
+    and images that could not be copied.
+    """
+
+    tables = {'posts': Post, 'comments': Comment, 'follows': Follow}
+
+    def __init__(self, table, media_from='.', chunk_size=1000, workers=4):
+        if table not in self.tables:
+            raise ImportDataError(f'Неизвестная таблица: {table}')
+        self.table = table
+        self.model = self.tables[table]
+        self.build = getattr(self, f'build_{table[:-1]}')
+        self.media_from = media_from
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.users = dict(User.objects.values_list('username', 'pk')
+                          .iterator(chunk_size=10000))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.imported = self.skipped = 0
+        self.errors = []
+        self.scopes = set()
+        self.posts = {}
+        self.explicit_ids = False
+
+    def run(self, rows, progress=None):
+        """Import the dicts of ``rows``, calling ``progress`` per chunk."""
+        numbered = enumerate(rows, 1)
+        with keep_dates(self.model), \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                chunk = list(islice(numbered, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, pool)
+                if progress:
+                    progress(self)
+        if self.explicit_ids:
+            self.reset_sequence()
+        if self.scopes:
+            touch(*self.scopes)
+
+    def import_chunk(self, chunk, pool):
+        if self.model is Comment:
+            self.load_posts(chunk)
+        objects, images = [], []
+        for number, row in chunk:
+            try:
+                if '_error' in row:
+                    raise ImportDataError(row['_error'])
+                objects.append((number, self.build(row)))
+            except (KeyError, TypeError, ValueError) as error:
+                self.error(number, error)
+                continue
+            if row.get('image'):
+                images.append((objects[-1][1], number, row['image']))
+        names = pool.map(lambda image: self.copy_image(*image[1:]), images)
+        for (post, _, _), name in zip(images, names):
+            post.image = name
+        self.explicit_ids |= any(obj.pk is not None for _, obj in objects)
+        inserted = self.insert(objects)
+        self.imported += inserted
+        self.skipped += len(chunk) - inserted
+        if self.model is Comment:
+            self.scopes.add('comments')
+        else:
+            self.scopes.add('feeds')
+
+    def insert(self, objects):
+        """Insert the numbered ``objects``, return how many went in.
+
+        A chunk failing on a constraint, an id taken already or twice in
+        the file, is inserted row by row to report the rows at fault.
+        """
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(
+                    [obj for _, obj in objects],
+                    ignore_conflicts=self.model is Follow)
+            return len(objects)
+        except IntegrityError:
+            pass
+        inserted = 0
+        for number, obj in objects:
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create([obj])
+            except IntegrityError as error:
+                self.error(number, f'не записана: {error}')
+            else:
+                inserted += 1
+        return inserted
+
+    def reset_sequence(self):
+        """Move the id sequence past the ids given in the file, where
+        the database has one."""
+        statements = connection.ops.sequence_reset_sql(no_style(),
+                                                       [self.model])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def error(self, number, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((number, str(message)))
+
+    def user_id(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise ImportDataError(f'нет пользователя {username}')
+
+    def build_post(self, row):
+        group_id = None
+        if row.get('group'):
+            group_id = self.groups.get(row['group'])
+            if group_id is None:
+                raise ImportDataError(f'нет группы {row["group"]}')
+            self.scopes.add(f'group-posts:{group_id}')
+        author_id = self.user_id(row['author'])
+        self.scopes.add(f'author:{author_id}')
+        return Post(id=row.get('id') or None, text=row['text'],
+                    author_id=author_id, group_id=group_id,
+                    pub_date=parse_date(row.get('pub_date')))
+
+    def load_posts(self, chunk):
+        """Authors and groups of the posts commented in ``chunk``."""
+        ids = {str(row.get('post')) for _, row in chunk}
+        ids = [int(pk) for pk in ids if pk.isdigit()]
+        self.posts = {
+            pk: (author_id, group_id) for pk, author_id, group_id in
+            Post.objects.filter(pk__in=ids).values_list(
+                'pk', 'author_id', 'group_id')}
+
+    def build_comment(self, row):
+        post_id = int(row['post'])
+        if post_id not in self.posts:
+            raise ImportDataError(f'нет записи {post_id}')
+        author_id, group_id = self.posts[post_id]
+        self.scopes.add(f'author:{author_id}')
+        if group_id:
+            self.scopes.add(f'group-posts:{group_id}')
+        return Comment(id=row.get('id') or None, post_id=post_id,
+                       author_id=self.user_id(row['author']),
+                       text=row['text'],
+                       created=parse_date(row.get('created')))
+
+    def build_follow(self, row):
+        user_id = self.user_id(row['user'])
+        author_id = self.user_id(row['author'])
+        if user_id == author_id:
+            raise ImportDataError('подписка на себя')
+        self.scopes.update((f'author:{user_id}', f'author:{author_id}'))
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def copy_image(self, number, path):
+        """Name of the copy of ``path`` in storage, ``None`` if it failed."""
+        source = os.path.join(self.media_from, path)
+        try:
+            with open(source, 'rb') as file:
+                return blob_storage().save(
+                    f'posts/{os.path.basename(path)}', File(file))
+        except OSError as error:
+            self.error(number, f'картинка {path}: {error.strerror}')
+            return None
+
+
+def rebuild_denormalized(tables, batch_size=1000):
+    """Recount what the signals skipped by ``bulk_create`` would keep.
+
+    Return the names of the rebuilt parts for the report.
+    """
+    rebuilt = ['счётчики']
+    rebuild_stats(batch_size=batch_size)
+    if 'posts' in tables:
+        get_backend().rebuild(batch_size=batch_size)
+        recount()
+        rebuilt += ['поисковый индекс', 'ссылки на картинки']
+    if uses_fanout() and {'posts', 'follows'} & set(tables):
+        readers = Follow.objects.values_list('user_id', flat=True).distinct()
+        for user_id in readers.iterator():
+            rebuild_timeline(user_id)
+        rebuilt.append('ленты подписок')
+    return rebuilt
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import collect
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки, на которые не ссылается ни одна запись'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int,
+                            help='Не трогать файлы моложе стольких секунд, '
+                                 'по умолчанию MEDIA_BLOB_GC_GRACE')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        files, freed = collect(options['grace'], options['dry_run'])
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {files}, {freed / 1024:.0f} КБ'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import dedupe, recount
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки записей, сохранённые под своими именами, '
+            'в хранилище по содержимому, одинаковые файлы хранятся '
+            'один раз')
+
+    def handle(self, *args, **options):
+        files, saved = dedupe()
+        recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {files}, освобождено дубликатами: '
+            f'{saved / 1024:.0f} КБ'))
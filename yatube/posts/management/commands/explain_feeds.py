@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.feeds import follow_feed
+from posts.models import Comment, Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+# plan fragments meaning a full table scan or a sort outside an index
+PROBLEMS = {
+    'sqlite': ('USE TEMP B-TREE',),
+    'postgresql': ('Seq Scan', 'Sort'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы запросов лент и комментариев и сообщает о '
+            'полных просмотрах таблиц и сортировках без индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы целиком')
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset, allowed in self.queries():
+            plan = queryset.explain()
+            problems = [line for line in plan.splitlines()
+                        if self.is_problem(line)
+                        and not any(text in line for text in allowed)]
+            style = self.style.ERROR if problems else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: {"проблемы" if problems else "ок"}'))
+            for line in (plan.splitlines() if options['verbose_plans']
+                         else problems):
+                self.stdout.write(f'    {line}')
+            if problems:
+                failed.append(name)
+        if failed:
+            raise CommandError(f'Неудачные планы: {", ".join(failed)}')
+
+    @staticmethod
+    def is_problem(line):
+        if any(text in line for text in PROBLEMS.get(connection.vendor, ())):
+            return True
+        # "SCAN posts_post" without an index, subquery scans are fine
+        return (connection.vendor == 'sqlite' and 'SCAN ' in line
+                and ' INDEX ' not in line and 'SUBQUERY' not in line)
+
+    def queries(self):
+        """Yield ``(name, page queryset, allowed plan fragments)``."""
+        per_page = settings.POSTS_PER_PAGE
+        post = Post.objects.order_by('-pub_date').first()
+        group = Group.objects.first()
+        reader = User.objects.filter(follower__isnull=False).first()
+        feeds = [('index', Post.objects.for_feed(), ())]
+        if group:
+            feeds.append(('group_posts', group.posts.for_feed(), ()))
+        if post:
+            feeds.append(('profile', post.author.posts.for_feed(), ()))
+        if reader:
+            # a merge of several authors can not come out of one index
+            feeds.append(('follow_index', follow_feed(reader),
+                          ('USE TEMP B-TREE FOR ORDER BY', 'Sort')))
+        for name, queryset, allowed in feeds:
+            paginator = CursorPaginator(queryset, per_page)
+            yield name, paginator.page_queryset(), allowed
+            if post:
+                key = paginator.get_key(post)
+                yield (f'{name} (курсор)', paginator.page_queryset(key),
+                       allowed)
+        comment = Comment.objects.order_by('-created').first()
+        if comment:
+            paginator = CursorPaginator(
+                comment.post.comments.select_related('author'),
+                settings.COMMENTS_PER_PAGE, ordering=('created', 'id'))
+            yield 'post_comments', paginator.page_queryset(), ()
+            yield ('post_comments (курсор)',
+                   paginator.page_queryset(paginator.get_key(comment)), ())
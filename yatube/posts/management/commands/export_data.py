@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, TABLES, Export, ExportError, parse_since
+
+
+class Command(BaseCommand):
+    help = ('Выгружает записи, комментарии, подписки или группы в NDJSON '
+            'или CSV потоком, не загружая таблицу в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=TABLES)
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--since',
+                            help='Только строки новее этой даты (ISO 8601)')
+        parser.add_argument('--output', help='Файл, по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            export = Export(options['table'], options['format'],
+                            parse_since(options['since']),
+                            options['chunk_size'])
+        except ExportError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(export)
+        else:
+            for line in export:
+                self.stdout.write(line, ending='')
+        if export.watermark is not None:
+            self.stderr.write(
+                f'Следующая выгрузка: --since {export.watermark.isoformat()}')
@@ -0,0 +1,40 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для всех картинок в MEDIA_ROOT/posts/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(self.generate, self.image_names()))
+        failed = results.count(False)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(results)}, с ошибкой: {failed}'))
+
+    def image_names(self):
+        root = os.path.join(settings.MEDIA_ROOT, 'posts')
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                yield os.path.relpath(path, settings.MEDIA_ROOT).replace(
+                    os.sep, '/')
+
+    def generate(self, name):
+        try:
+            generate(name)
+        except Exception as error:
+            self.stderr.write(f'{name}: {error}')
+            return False
+        finally:
+            connection.close()
+        return True
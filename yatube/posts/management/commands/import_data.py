@@ -0,0 +1,71 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import (FORMATS, ImportDataError, Importer, read_rows,
+                            rebuild_denormalized)
+
+
+class Command(BaseCommand):
+    help = ('Загружает записи, комментарии или подписки из NDJSON или CSV '
+            'пачками через bulk_create, затем пересчитывает счётчики '
+            'и поисковый индекс')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=Importer.tables)
+        parser.add_argument('files', nargs='+')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--media-from',
+                            help='Откуда брать картинки, по умолчанию '
+                                 'папка файла')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Потоков для копирования картинок')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересчитывать счётчики и индекс, '
+                                 'если дальше загружается ещё что-то')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = skipped = 0
+        for path in options['files']:
+            importer = self.import_file(path, options)
+            total += importer.imported
+            skipped += importer.skipped
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {total}, пропущено: {skipped}, '
+            f'{total / max(elapsed, 1e-6):.0f} строк/с'))
+        if not options['no_rebuild']:
+            rebuilt = rebuild_denormalized([options['table']])
+            self.stdout.write(self.style.SUCCESS(
+                f'Перестроено: {", ".join(rebuilt)} за '
+                f'{time.monotonic() - started - elapsed:.1f} с'))
+
+    def import_file(self, path, options):
+        started = time.monotonic()
+        format = options['format'] or os.path.splitext(path)[1][1:]
+        if format not in FORMATS:
+            raise CommandError(f'Не понятен формат файла {path}, '
+                               'укажите --format')
+        media_from = options['media_from'] or os.path.dirname(path)
+        try:
+            importer = Importer(options['table'], media_from,
+                                options['chunk_size'], options['workers'])
+            with open(path, encoding='utf-8', newline='') as file:
+                importer.run(read_rows(file, format),
+                             lambda importer: self.progress(importer, path,
+                                                            started))
+        except (ImportDataError, OSError) as error:
+            raise CommandError(error)
+        for number, message in importer.errors:
+            self.stderr.write(f'{path}:{number}: {message}')
+        return importer
+
+    def progress(self, importer, path, started):
+        elapsed = time.monotonic() - started
+        rate = importer.imported / max(elapsed, 1e-6)
+        self.stdout.write(f'{path}: {importer.imported} строк, '
+                          f'{rate:.0f} строк/с')
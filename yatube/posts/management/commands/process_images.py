@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import adopt, process
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Пережимает картинки записей из оригиналов: те, что ещё не '
+            'обработаны, а с флагами и остальные')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Заново пережать все картинки с '
+                                 'оригиналами, например после смены '
+                                 'POST_IMAGE_MAX_SIDE')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Перенести в оригиналы и пережать '
+                                 'картинки, загруженные до обработки')
+
+    def handle(self, *args, **options):
+        if options['legacy']:
+            legacy = Post.objects.exclude(image='').exclude(
+                image__isnull=True).filter(
+                Q(image_original='') | Q(image_original__isnull=True))
+            # listed first, the loop changes the rows it selects
+            for post in list(legacy.only('image')):
+                adopt(post)
+        posts = Post.objects.exclude(image_original='').exclude(
+            image_original__isnull=True)
+        if not options['all']:
+            posts = posts.filter(Q(image='') | Q(image__isnull=True))
+        done = failed = 0
+        for pk, original in list(posts.values_list('pk', 'image_original')):
+            try:
+                process(pk, original)
+            except Exception as error:
+                self.stderr.write(f'{original}: {error}')
+                failed += 1
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done}, с ошибкой: {failed}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import rebuild_timeline, uses_fanout
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Заново собирает ленты подписок для стратегии '
+            'FOLLOW_FEED_STRATEGY = "write"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='Пользователи, по умолчанию все')
+
+    def handle(self, *args, **options):
+        if not uses_fanout():
+            self.stderr.write('FOLLOW_FEED_STRATEGY не равна "write", '
+                              'ленты не используются')
+            return
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        total = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            rebuild_timeline(user_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано лент: {total}'))
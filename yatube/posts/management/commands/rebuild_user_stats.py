@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики записей, подписок и комментариев '
+            'пользователей и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        created, fixed = rebuild_stats(batch_size=options['batch_size'],
+                                       dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано счётчиков: {created}, исправлено: {fixed}'))
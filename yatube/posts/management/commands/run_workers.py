@@ -0,0 +1,62 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import queue, tasks  # noqa: F401, registers the tasks
+
+
+def run_worker(stop, poll):
+    # the parent stops the workers through ``stop`` once the task at hand
+    # is done; Ctrl+C reaches the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    queue.work(stop, poll)
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчики фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll', type=float,
+                            help='Пауза между проверками очереди в секундах, '
+                                 'по умолчанию TASKS_POLL')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выполнить задачи в очереди и выйти')
+
+    def handle(self, *args, **options):
+        if options['burst']:
+            done = queue.drain()
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {done}'))
+            return
+        if options['processes'] < 1:
+            raise CommandError('Нужен хотя бы один процесс')
+        poll = options['poll'] or settings.TASKS_POLL
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # children must open their own connections
+        connection.close()
+        workers = [
+            context.Process(target=run_worker, args=(stop, poll),
+                            name=f'tasks-{number}')
+            for number in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        # not stop.set() in the handler: it would deadlock with a wait()
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.stdout.write(self.style.SUCCESS(
+            f'Запущено обработчиков: {len(workers)}'))
+        try:
+            while any(worker.is_alive() for worker in workers):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        stop.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write('Обработчики остановлены')
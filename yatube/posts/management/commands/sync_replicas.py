@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из DB_REPLICAS, '
+            'чтобы проверить чтение с реплик локально')
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Реплики серверных баз наполняет сама СУБД')
+        if not settings.DB_REPLICAS:
+            raise CommandError('Реплики не настроены, задайте DB_REPLICAS')
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        try:
+            for alias in settings.DB_REPLICAS:
+                connections[alias].close()
+                name = connections[alias].settings_dict['NAME']
+                target = sqlite3.connect(name)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: скопировано в {name}'))
+        finally:
+            source.close()
@@ -19,6 +19,6 @@ class Migration(migrations.Migration):
         ),
         migrations.AddConstraint(
             model_name='follow',
-            constraint=models.UniqueConstraint(fields=('follower', 'following'), name='unique subscription'),
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique subscription'),
         ),
     ]
@@ -0,0 +1,35 @@
+from django.db import migrations, OperationalError
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            "text, tokenize = 'unicode61 remove_diacritics 2', "
+            "prefix = '2 3')")
+    except OperationalError:
+        # SQLite built without FTS5, search falls back to LIKE
+        return
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, text) '
+        'SELECT id, text FROM posts_post')
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
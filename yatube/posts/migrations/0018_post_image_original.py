@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_original',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='originals/posts/'),
+        ),
+    ]
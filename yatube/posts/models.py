@@ -1,5 +1,11 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+
+from .storage import ContentAddressedStorage
+from .versions import attach_card_versions
 
 User = get_user_model()
 
@@ -13,6 +19,21 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Load everything a post card shows in the same query.
+
+        The comment count is a correlated subquery rather than a JOIN with
+        GROUP BY, which would stop feeds from reading their index in order.
+        """
+        comments = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+                    .values('post').annotate(total=Count('pk'))
+                    .values('total'))
+        return self.select_related('author', 'group').annotate(
+            comment_count=Coalesce(
+                Subquery(comments, output_field=IntegerField()), 0))
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст записи',
                             help_text='Поле для ввода теста записи')
@@ -31,14 +52,35 @@ class Post(models.Model):
                               help_text=('Здесь указана группа, '
                                          'к которой относится запись')
                               )
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=ContentAddressedStorage())
+    # the upload as sent, image is re-encoded from it, see posts.images
+    image_original = models.FileField(upload_to='originals/posts/',
+                                      blank=True, null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # match the (pub_date, id) keyset of the feeds, see explain_feeds
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def card_version(self):
+        """Key of the cached card, feeds set it for a whole page at once."""
+        attach_card_versions([self])
+        return self.card_version
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
@@ -54,6 +96,12 @@ class Comment(models.Model):
                                               'дата публикации записи',),
                                    db_index=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, related_name='follower',
@@ -68,6 +116,104 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique subscription')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats',
+                                verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='Записей')
+    followers_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='Подписок')
+    comments_count = models.PositiveIntegerField(default=0,
+                                                 verbose_name='Комментариев')
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class Blob(models.Model):
+    """File of ``ContentAddressedStorage`` and the posts showing it."""
+    name = models.CharField(max_length=255, primary_key=True,
+                            verbose_name='Файл')
+    size = models.PositiveIntegerField(default=0, verbose_name='Размер')
+    refcount = models.PositiveIntegerField(default=0,
+                                           verbose_name='Ссылок')
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
+    """Queued call of a ``posts.queue.task`` function, see posts/queue.py."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'В очереди'), (RUNNING, 'Выполняется'),
+                (DONE, 'Выполнена'), (FAILED, 'Не удалась')]
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    args = models.TextField(default='[]', verbose_name='Аргументы')
+    key = models.CharField(max_length=200, blank=True, null=True,
+                           verbose_name='Ключ идемпотентности')
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(
+        default=4, verbose_name='Попыток не больше')
+    run_at = models.DateTimeField(verbose_name='Запустить не раньше')
+    locked_by = models.CharField(max_length=100, blank=True,
+                                 verbose_name='Исполнитель')
+    locked_until = models.DateTimeField(null=True, blank=True,
+                                        verbose_name='Занята до')
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Поставлена')
+
+    class Meta:
+        constraints = [
+            # one pending task per key, a running one may be queued again
+            models.UniqueConstraint(fields=['key'],
+                                    condition=models.Q(status='pending'),
+                                    name='unique pending task key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
+
+
+class TimelineEntry(models.Model):
+    """Post pushed into a follower's precomputed follow feed."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Читатель')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='Запись')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique timeline entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_date_idx')
+        ]
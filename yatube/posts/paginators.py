@@ -0,0 +1,204 @@
+import base64
+import binascii
+import datetime as dt
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+from yatube.cache import get_or_compute
+
+from .versions import get_versions
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision, keys must compare exactly."""
+
+    def default(self, o):
+        if isinstance(o, dt.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator driven by opaque ``?cursor=`` tokens.
+
+    Pages are fetched with a ``WHERE`` on the key of the last seen row
+    instead of ``LIMIT/OFFSET``, and no ``COUNT(*)`` is ever run, so a
+    deep page costs the same as the first one. The last field of
+    ``ordering`` must be unique to make the key total.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def get_page(self, cursor):
+        """Return the page addressed by ``cursor``.
+
+        A missing or malformed cursor yields the first page, the same way
+        ``Paginator.get_page`` forgives a bad page number.
+        """
+        try:
+            direction, key = self.decode_cursor(cursor)
+        except InvalidCursor:
+            direction, key = NEXT, None
+        if direction == PREVIOUS:
+            rows, has_previous = self._fetch(key, backwards=True)
+            rows.reverse()
+            has_next = True
+        else:
+            rows, has_next = self._fetch(key)
+            has_previous = key is not None
+        page = Page(rows, 1, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(NEXT, rows[-1])
+        if rows and has_previous:
+            page.previous_cursor = self.encode_cursor(PREVIOUS, rows[0])
+        return page
+
+    def page_queryset(self, key=None, backwards=False):
+        """The single query a page runs, one extra row tells if more exist."""
+        queryset = self.object_list
+        if key is not None:
+            queryset = queryset.filter(self._beyond(key, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        return queryset[:self.per_page + 1]
+
+    def _fetch(self, key, backwards=False):
+        rows = list(self.page_queryset(key, backwards))
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def _beyond(self, key, backwards=False):
+        """Build ``(a, b) > (x, y)`` style row comparison as a ``Q``.
+
+        The redundant ``a >= x`` in front gives the database a range on
+        the leading index column instead of an ``OR`` of lookups.
+        """
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            step = Q(**{f'{field}__{lookup}': key[index]})
+            for equal_field, value in zip(self.fields, key[:index]):
+                step &= Q(**{equal_field: value})
+            condition |= step
+        return Q(**{f'{self.fields[0]}__{lookup}e': key[0]}) & condition
+
+    def get_key(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def encode_cursor(self, direction, row):
+        payload = json.dumps([direction, self.get_key(row)],
+                             cls=CursorEncoder)
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            raise InvalidCursor
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise InvalidCursor
+        if direction not in (NEXT, PREVIOUS) or not (
+                isinstance(values, list) and len(values) == len(self.fields)):
+            raise InvalidCursor
+        return direction, self.parse_key(values)
+
+    def parse_key(self, values):
+        opts = self.object_list.model._meta
+        try:
+            key = [opts.get_field(field).to_python(value)
+                   for field, value in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor
+        # rows never have NULL keys, and a lookup by None fails
+        if None in key:
+            raise InvalidCursor
+        return key
+
+
+class CachedCountPaginator(Paginator):
+    """Numbered paginator that does not run ``COUNT(*)`` on every request.
+
+    The count is cached per queryset SQL for ``PAGINATOR_COUNT_TIMEOUT``
+    seconds and invalidated early through the ``feeds`` version, touched
+    by post and follow signals; one request recounts while the others
+    wait for its result. Unfiltered querysets over tables larger
+    than ``PAGINATOR_ESTIMATE_THRESHOLD`` rows are not counted at all:
+    the database estimate is used, so the last pages may come out short.
+    """
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        version = get_versions(['feeds'])['feeds']
+        digest = hashlib.md5(f'{sql}|{params}|{version}'.encode())
+        key = f'paginator:count:{digest.hexdigest()}'
+        return get_or_compute(key, self.compute_count,
+                              settings.PAGINATOR_COUNT_TIMEOUT)
+
+    def compute_count(self):
+        count = self.estimate_count()
+        if count is None:
+            count = Paginator.count.func(self)
+        return count
+
+    def estimate_count(self):
+        """Cheap row count estimate, ``None`` when an exact count is due."""
+        query = self.object_list.query
+        if query.where or query.distinct:
+            return None
+        model = self.object_list.model
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class '
+                               'WHERE relname = %s', [model._meta.db_table])
+                row = cursor.fetchone()
+            estimate = int(row[0]) if row else 0
+        else:
+            estimate = model._default_manager.using(
+                self.object_list.db).aggregate(top=Max('pk'))['top'] or 0
+        if estimate < settings.PAGINATOR_ESTIMATE_THRESHOLD:
+            return None
+        return estimate
+
+
+def paginate(request, object_list):
+    """Return the page of ``object_list`` requested by ``request``.
+
+    ``settings.POSTS_PAGINATION`` picks between keyset pages addressed by
+    ``?cursor=`` and classic numbered pages addressed by ``?page=``. Old
+    ``?page=`` links keep working in cursor mode.
+    """
+    cursor_mode = settings.POSTS_PAGINATION == 'cursor' and (
+        'cursor' in request.GET or 'page' not in request.GET)
+    if cursor_mode:
+        paginator = CursorPaginator(object_list, settings.POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = CachedCountPaginator(object_list, settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,190 @@
+"""Task queue kept in the database, no broker needed.
+
+``@task`` registers a function; ``func.enqueue(*args)`` stores a
+``Task`` row in the caller's transaction, so a task is queued exactly
+when the write that caused it commits. With a ``key`` there is at most
+one pending task per key: the side effects are written to be idempotent
+(re-index post 5, resync one follow), so a burst of writes collapses
+into one run.
+
+Workers claim tasks under a lease and retry failures with exponential
+backoff. ``TASKS_MODE`` picks who runs them:
+
+* ``'thread'``: a worker thread in every web process, woken on commit;
+* ``'workers'``: only ``manage.py run_workers`` processes;
+* ``'eager'``: right away in the caller, as plain function calls.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+_wake = threading.Event()
+_thread = None
+_lock = threading.Lock()
+
+
+class TaskFunction:
+    """A function that can be called now or enqueued for a worker."""
+
+    def __init__(self, func, retries, backoff):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.retries = retries
+        self.backoff = backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def enqueue(self, *args, key=None, delay=0):
+        """Queue a call with JSON serializable ``args``."""
+        if settings.TASKS_MODE == 'eager':
+            self.func(*args)
+            return
+        Task.objects.bulk_create([Task(
+            name=self.name, args=json.dumps(args), key=key,
+            max_attempts=self.retries + 1,
+            run_at=timezone.now() + timedelta(seconds=delay))],
+            ignore_conflicts=key is not None)
+        if settings.TASKS_MODE == 'thread':
+            transaction.on_commit(wake)
+
+
+def task(retries=3, backoff=5):
+    """Register a task retried ``retries`` times, ``backoff`` seconds
+    apart at first and twice as long after every failure."""
+    def decorator(func):
+        function = TaskFunction(func, retries, backoff)
+        REGISTRY[function.name] = function
+        return function
+    return decorator
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def requeue(task, status, **fields):
+    """Move a claimed task to ``status``; a task that cannot go back to
+    the queue because an equal one is pending already is done."""
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=task.pk).update(status=status, **fields)
+    except IntegrityError:
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.DONE, last_error='Слита с задачей в очереди')
+
+
+def claim(worker, limit=10):
+    """Lease up to ``limit`` due tasks to ``worker`` and return them.
+
+    Tasks whose lease ran out, their worker died, are queued again first.
+    """
+    now = timezone.now()
+    for task in Task.objects.filter(status=Task.RUNNING,
+                                    locked_until__lt=now):
+        requeue(task, Task.PENDING, locked_by='')
+    with transaction.atomic():
+        ids = list(Task.objects.filter(
+            status=Task.PENDING, run_at__lte=now).order_by(
+            'run_at', 'pk').values_list('pk', flat=True)[:limit])
+        Task.objects.filter(pk__in=ids, status=Task.PENDING).update(
+            status=Task.RUNNING, locked_by=worker,
+            locked_until=now + timedelta(seconds=settings.TASKS_LEASE),
+            attempts=F('attempts') + 1)
+    return list(Task.objects.filter(
+        pk__in=ids, status=Task.RUNNING, locked_by=worker).order_by(
+        'run_at', 'pk'))
+
+
+def run(task):
+    """Run one claimed task and record how it went."""
+    function = REGISTRY.get(task.name)
+    try:
+        if function is None:
+            raise LookupError(f'Неизвестная задача {task.name}')
+        function(*json.loads(task.args))
+    except Exception as error:
+        logger.exception('Задача %s не выполнена', task)
+        error = f'{type(error).__name__}: {error}'
+        if function is None or task.attempts >= task.max_attempts:
+            requeue(task, Task.FAILED, last_error=error, locked_by='')
+            return False
+        delay = function.backoff * 2 ** (task.attempts - 1)
+        requeue(task, Task.PENDING, last_error=error, locked_by='',
+                run_at=timezone.now() + timedelta(seconds=delay))
+        return False
+    requeue(task, Task.DONE, last_error='', locked_by='')
+    return True
+
+
+def drain(worker=None, limit=10):
+    """Run due tasks until there are none, return how many ran."""
+    worker = worker or worker_name()
+    total = 0
+    while True:
+        tasks = claim(worker, limit)
+        if not tasks:
+            return total
+        for task in tasks:
+            run(task)
+        total += len(tasks)
+
+
+def purge(older_than=None):
+    """Delete finished tasks older than ``TASKS_KEEP_DONE`` seconds."""
+    if older_than is None:
+        older_than = settings.TASKS_KEEP_DONE
+    deadline = timezone.now() - timedelta(seconds=older_than)
+    deleted, _ = Task.objects.filter(status=Task.DONE,
+                                     created__lt=deadline).delete()
+    return deleted
+
+
+def work(stop, poll=1.0, wake_event=None):
+    """Drain the queue until ``stop`` is set, waiting ``poll`` seconds or
+    for ``wake_event`` between rounds; retried tasks come due meanwhile."""
+    worker = worker_name()
+    last_purge = 0
+    while not stop.is_set():
+        try:
+            drain(worker)
+            if time.monotonic() - last_purge > 60 * 60:
+                purge()
+                last_purge = time.monotonic()
+        except Exception:
+            logger.exception('Сбой обработчика задач')
+        finally:
+            connection.close()
+        event = wake_event or stop
+        event.wait(poll)
+        if wake_event is not None:
+            wake_event.clear()
+
+
+def wake():
+    """Wake this process's worker thread, starting it the first time."""
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(
+                target=work, args=(threading.Event(),),
+                kwargs={'poll': settings.TASKS_POLL, 'wake_event': _wake},
+                name='tasks', daemon=True)
+            _thread.start()
+    _wake.set()
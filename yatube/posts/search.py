@@ -0,0 +1,165 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .paginators import CursorPaginator, InvalidCursor
+
+FTS_TABLE = 'posts_post_fts'
+
+
+class SearchBackend:
+    """Full-text index over ``Post.text``.
+
+    ``search`` returns ``(rank, post_id)`` pairs ordered by ascending
+    rank, the best match first, starting strictly after ``key`` (or
+    before it when ``backwards`` is set, in descending order).
+    """
+
+    def index(self, post):
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=1000):
+        raise NotImplementedError
+
+    def search(self, query, key=None, backwards=False, limit=10):
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 table keyed by post id, ranked with bm25."""
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def rebuild(self, batch_size=1000):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            posts = Post.objects.order_by().values_list('pk', 'text')
+            batch = []
+            for row in posts.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    self._insert(cursor, batch)
+                    batch = []
+            self._insert(cursor, batch)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)', rows)
+
+    def search(self, query, key=None, backwards=False, limit=10):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        sql = f'SELECT rank, rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [match]
+        if key is not None:
+            op = '<' if backwards else '>'
+            sql += f' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))'
+            params += [key[0], key[0], key[1]]
+        order = 'DESC' if backwards else 'ASC'
+        sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+    @staticmethod
+    def match_expression(query):
+        """Turn user input into prefix terms joined with implicit AND."""
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Fallback for databases without a full-text index.
+
+    Scans with ``icontains`` and has no relevance, so results come newest
+    first: the rank of a post is its negated id.
+    """
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        pass
+
+    def search(self, query, key=None, backwards=False, limit=10):
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        posts = Post.objects.order_by('-pk' if not backwards else 'pk')
+        for term in terms:
+            posts = posts.filter(text__icontains=term)
+        if key is not None:
+            lookup = 'pk__gt' if backwards else 'pk__lt'
+            posts = posts.filter(**{lookup: key[1]})
+        return [(-pk, pk) for pk in
+                posts.values_list('pk', flat=True)[:limit]]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Backend named by ``POSTS_SEARCH_BACKEND``, or FTS5 when available."""
+    if settings.POSTS_SEARCH_BACKEND:
+        return import_string(settings.POSTS_SEARCH_BACKEND)()
+    if (connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()):
+        return SQLiteFTSBackend()
+    return SimpleSearchBackend()
+
+
+class SearchPaginator(CursorPaginator):
+    """Cursor pages over ``(rank, id)`` of search results."""
+
+    def __init__(self, query, per_page, backend=None):
+        self.query = query
+        self.backend = backend or get_backend()
+        self.fields = ['rank', 'id']
+        Paginator.__init__(self, [], per_page)
+
+    def _fetch(self, key, backwards=False):
+        hits = self.backend.search(self.query, key, backwards,
+                                   self.per_page + 1)
+        more = len(hits) > self.per_page
+        hits = hits[:self.per_page]
+        posts = Post.objects.for_feed().in_bulk([pk for _, pk in hits])
+        rows = []
+        for rank, pk in hits:
+            if pk in posts:
+                posts[pk].rank = rank
+                rows.append(posts[pk])
+        return rows, more
+
+    def parse_key(self, values):
+        try:
+            return [float(values[0]), int(values[1])]
+        except (TypeError, ValueError):
+            raise InvalidCursor
+
+
+def search_posts(query, cursor=None):
+    paginator = SearchPaginator(query, settings.POSTS_PER_PAGE)
+    return paginator.get_page(cursor)
@@ -0,0 +1,171 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, feeds, images, tasks, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .versions import touch
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+def recount_stats(*user_ids):
+    for user_id in user_ids:
+        tasks.recount_stats.enqueue(user_id, key=f'stats:{user_id}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def count_new_writing(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        recount_stats(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def count_deleted_writing(sender, instance, **kwargs):
+    recount_stats(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        recount_stats(instance.author_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    recount_stats(instance.author_id, instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_card(sender, instance, **kwargs):
+    touch(f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_commented_post_card(sender, instance, **kwargs):
+    touch(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def expire_group_post_cards(sender, instance, **kwargs):
+    touch(f'group:{instance.pk}')
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw, **kwargs):
+    """A post moved to another group changes the old group page too.
+
+    The image it had is kept as well, for its blob's reference count.
+    """
+    instance._old_group_id = instance._old_image = None
+    if instance.pk and not raw:
+        instance._old_group_id, instance._old_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_pages(sender, instance, **kwargs):
+    scopes = {f'author:{instance.author_id}'}
+    for group_id in (instance.group_id,
+                     getattr(instance, '_old_group_id', None)):
+        if group_id:
+            scopes.add(f'group-posts:{group_id}')
+    touch(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_commented_pages(sender, instance, **kwargs):
+    scopes = ['comments']
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        post = None
+    if post is not None:
+        scopes.append(f'author:{post.author_id}')
+        if post.group_id:
+            scopes.append(f'group-posts:{post.group_id}')
+    touch(*scopes)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_follow_pages(sender, instance, **kwargs):
+    touch(f'author:{instance.author_id}', f'author:{instance.user_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def expire_group_pages(sender, instance, **kwargs):
+    touch('groups', f'group-posts:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw, **kwargs):
+    if created and not raw and feeds.uses_fanout():
+        tasks.fan_out.enqueue(instance.pk, key=f'fan-out:{instance.pk}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def sync_timeline(sender, instance, raw=False, **kwargs):
+    if not raw and feeds.uses_fanout():
+        tasks.sync_timeline.enqueue(
+            instance.user_id, instance.author_id,
+            key=f'timeline:{instance.user_id}:{instance.author_id}')
+
+
+@receiver(post_save, sender=Post)
+def render_thumbnails(sender, instance, raw, **kwargs):
+    """Thumbnails of an image are rendered once, when it is set."""
+    if (instance.image and not raw
+            and instance.image.name != getattr(instance, '_old_image', None)):
+        name = instance.image.name
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+@receiver(post_save, sender=Post)
+def process_uploaded_image(sender, instance, raw, **kwargs):
+    if getattr(instance, '_process_image', False) and not raw:
+        instance._process_image = False
+        post_id, original = instance.pk, instance.image_original.name
+        transaction.on_commit(lambda: images.schedule(post_id, original))
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, raw, **kwargs):
+    old, new = getattr(instance, '_old_image', None), instance.image.name
+    if not raw and old != new:
+        blobs.change_refs(new, 1)
+        blobs.change_refs(old, -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    blobs.change_refs(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def index_post_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.sync_search.enqueue(instance.pk, key=f'search:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_feed_counts(sender, **kwargs):
+    touch('feeds')
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+# counter -> (model whose rows are counted, FK pointing at the user)
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+    'comments_count': (Comment, 'author'),
+}
+
+
+def counted_users(users):
+    """Annotate ``users`` with counters computed from the source tables."""
+    annotations = {}
+    for field, (model, lookup) in COUNTERS.items():
+        totals = (model.objects.filter(**{lookup: OuterRef('pk')})
+                  .order_by().values(lookup)
+                  .annotate(total=Count('pk')).values('total'))
+        annotations[field] = Coalesce(Subquery(totals), 0)
+    return users.annotate(**annotations)
+
+
+def rebuild_stats(users=None, batch_size=1000, dry_run=False):
+    """Recount stats of ``users`` and store the ones that drifted.
+
+    Users are walked in primary key batches, each batch is written in its
+    own transaction. Return a ``(created, fixed)`` pair of row counts.
+    """
+    if users is None:
+        users = User.objects.all()
+    users = counted_users(users.order_by('pk'))
+    created = fixed = 0
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return created, fixed
+        last_pk = batch[-1].pk
+        stored = UserStats.objects.in_bulk([user.pk for user in batch])
+        new_rows, changed_rows = [], []
+        for user in batch:
+            stats = stored.get(user.pk)
+            if stats is None:
+                new_rows.append(UserStats(
+                    user_id=user.pk,
+                    **{field: getattr(user, field) for field in COUNTERS}))
+                continue
+            if any(getattr(stats, field) != getattr(user, field)
+                   for field in COUNTERS):
+                for field in COUNTERS:
+                    setattr(stats, field, getattr(user, field))
+                changed_rows.append(stats)
+        created += len(new_rows)
+        fixed += len(changed_rows)
+        if dry_run:
+            continue
+        with transaction.atomic():
+            UserStats.objects.bulk_create(new_rows, ignore_conflicts=True)
+            UserStats.objects.bulk_update(changed_rows, list(COUNTERS))
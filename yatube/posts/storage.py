@@ -0,0 +1,67 @@
+"""Content-addressed file storage for post images.
+
+A file is stored once under the SHA-256 of its content, e.g.
+``posts/3f/3f9a...c2.webp`` for anything saved to ``posts/``: the same
+image uploaded by many users is one file, and a name always means the
+same bytes, so it can be cached by browsers forever. Which post uses
+which blob is tracked in ``posts.blobs``.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_blob(name):
+    return bool(name and BLOB_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` naming files by the digest of their content.
+
+    The content is hashed while it is streamed to a temporary file next
+    to the blobs, which is then renamed into place, or dropped when the
+    blob already exists.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # names never collide, the content decides them in _save()
+        return name
+
+    def blob_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = self.blob_name(name, digest.hexdigest())
+            path = self.path(name)
+            if os.path.exists(path):
+                # a fresh mtime keeps the blob from the garbage collector
+                # until the post referencing it is saved
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # same bytes if another request got here first
+                os.replace(temporary, path)
+                # mkstemp() leaves the file readable by its owner only
+                os.chmod(path, self.file_permissions_mode or 0o644)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name.replace('\\', '/')
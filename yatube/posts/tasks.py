@@ -0,0 +1,47 @@
+"""Side effects of writes, run by the task queue (posts/queue.py).
+
+Every task reads the current state of the rows it is given, so running
+it late, twice or after the row is gone does the right thing; they are
+queued with idempotency keys.
+"""
+from . import feeds, stats
+from .models import Follow, Post, User
+from .queue import task
+from .search import get_backend
+
+
+@task()
+def recount_stats(user_id):
+    """Recount the stats of a user from the source tables.
+
+    A user without a stats row may be one whose delete is cascading, so
+    only the rows in place are recounted; ``rebuild_stats`` fills gaps.
+    """
+    stats.rebuild_stats(User.objects.filter(pk=user_id,
+                                            stats__isnull=False))
+
+
+@task()
+def sync_search(post_id):
+    """Index the text of a post, or drop it if the post is gone."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        get_backend().remove(post_id)
+    else:
+        get_backend().index(post)
+
+
+@task()
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        feeds.fan_out(post)
+
+
+@task()
+def sync_timeline(user_id, author_id):
+    """Backfill or clear a timeline after a follow or an unfollow."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        feeds.add_author(user_id, author_id)
+    else:
+        feeds.remove_author(user_id, author_id)
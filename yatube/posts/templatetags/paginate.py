@@ -0,0 +1,35 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Query string of the current request pointing at another page.
+
+    Filters such as ``?q=`` are kept, the other pagination parameter is
+    dropped so cursor and numbered links never mix.
+    """
+    query = context['request'].GET.copy()
+    for name in ('page', 'cursor'):
+        query.pop(name, None)
+    query.update(params)
+    return query.urlencode()
+
+
+@register.filter
+def page_window(page, on_each_side=2):
+    """First, last and ``on_each_side`` page numbers around the current.
+
+    ``None`` marks a gap, so templates render a fixed number of links
+    however many pages there are.
+    """
+    last = page.paginator.num_pages
+    numbers = {1, last} | set(range(max(page.number - on_each_side, 1),
+                                    min(page.number + on_each_side, last) + 1))
+    window = []
+    for number in sorted(numbers):
+        if window and number - window[-1] > 1:
+            window.append(None)
+        window.append(number)
+    return window
@@ -0,0 +1,13 @@
+from django import template
+
+from ..thumbnails import thumbnail_urls
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_thumbnail(post):
+    if not post.image:
+        # a new upload is still being re-encoded
+        return {'pending': bool(post.image_original)}
+    return {'urls': thumbnail_urls(post.image.name), 'pending': True}
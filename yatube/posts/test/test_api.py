@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostsApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for number in range(15):
+            Post.objects.create(text=f'Пост {number}', author=cls.user,
+                                group=cls.group if number % 2 else None)
+        cls.post = Post.objects.order_by('-pub_date', '-id').first()
+        Comment.objects.create(text='Комментарий', post=cls.post,
+                               author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.expected = list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(f'api:{name}', args=args), params)
+        return response, response.json()
+
+    def test_feed_pages_by_cursor(self):
+        _, first = self.get('posts', limit=10)
+        _, second = self.get('posts', limit=10, cursor=first['next_cursor'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, self.expected)
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(first['results'][0]['comment_count'], 1)
+        self.assertEqual(first['results'][0]['author'], 'Bobby')
+
+    def test_fields_select_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response, data = self.get('posts', fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        sql = queries[-1]['sql']
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('posts_comment', sql)
+        response, data = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_and_profile_feeds(self):
+        _, data = self.get('group_posts', self.group.slug, limit=100)
+        self.assertEqual(len(data['results']), 7)
+        self.assertTrue(all(post['group'] == 'group'
+                            for post in data['results']))
+        _, data = self.get('profile_posts', self.user.username, limit=100)
+        self.assertEqual(len(data['results']), 15)
+        _, data = self.get('profile', self.user.username)
+        self.assertEqual((data['posts_count'], data['followers_count']),
+                         (15, 1))
+        response, _ = self.get('group_posts', 'missing')
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_detail_with_comments(self):
+        _, data = self.get('post', self.user.username, self.post.pk,
+                           fields='id,text')
+        self.assertEqual(data['post'], {'id': self.post.pk,
+                                        'text': self.post.text})
+        self.assertEqual(data['comments']['results'][0]['author'], 'Reader')
+        _, data = self.get('post_comments', self.user.username, self.post.pk)
+        self.assertEqual(len(data['results']), 1)
+
+    def test_follow_feed_needs_login(self):
+        response, _ = self.get('follow_posts')
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.reader)
+        _, data = self.get('follow_posts', limit=100)
+        self.assertEqual(len(data['results']), 15)
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse('api:posts'))
+        response = self.client.get(reverse('api:posts'),
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,85 @@
+import io
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+from ..blobs import IMMUTABLE, blob_storage, collect
+from ..models import Blob, Post
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        override = override_settings(MEDIA_ROOT=self.workdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def post(self, author, content, name='cat.gif'):
+        return Post.objects.create(
+            text='Кот', author=author,
+            image=SimpleUploadedFile(name, content, 'image/gif'))
+
+    def refcount(self, post):
+        return Blob.objects.get(name=post.image.name).refcount
+
+    def test_same_content_is_stored_once(self):
+        first = self.post(self.user, b'GIF89a cat')
+        second = self.post(self.reader, b'GIF89a cat', name='other.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.gif'))
+        self.assertEqual(self.refcount(first), 2)
+        third = self.post(self.user, b'GIF89a dog')
+        self.assertNotEqual(third.image.name, first.image.name)
+        files = [name for _, _, names in os.walk(self.workdir.name)
+                 for name in names]
+        self.assertEqual(len(files), 2)
+
+    def test_refcounts_follow_posts_and_collect_removes_orphans(self):
+        first = self.post(self.user, b'GIF89a cat')
+        second = self.post(self.reader, b'GIF89a cat')
+        second.delete()
+        self.assertEqual(self.refcount(first), 1)
+        name = first.image.name
+        first.image = None
+        first.save()
+        self.assertEqual(Blob.objects.get(name=name).refcount, 0)
+        self.assertEqual(collect(), (0, 0))
+        self.assertEqual(collect(grace=-1), (1, 10))
+        self.assertFalse(blob_storage().exists(name))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+    def test_dedupe_moves_files_by_name_into_blobs(self):
+        for name in ('posts/a.gif', 'posts/b.gif'):
+            default_storage.save(name, ContentFile(b'GIF89a same'))
+        Post.objects.bulk_create([
+            Post(text='a', author=self.user, image='posts/a.gif'),
+            Post(text='b', author=self.reader, image='posts/b.gif'),
+        ])
+        out = io.StringIO()
+        call_command('dedupe_media', stdout=out)
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(Blob.objects.get(name=names.pop()).refcount, 2)
+        self.assertFalse(default_storage.exists('posts/a.gif'))
+        self.assertIn('Перенесено файлов: 2', out.getvalue())
+
+    def test_blobs_are_served_immutable(self):
+        post = self.post(self.user, b'GIF89a cat')
+        response = Client().get(post.image.url)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertEqual(b''.join(response.streaming_content), b'GIF89a cat')
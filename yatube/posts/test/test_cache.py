@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from yatube.cache import COMPRESSED, PLAIN, SQLiteCache, get_or_compute
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def make_cache(self, **params):
+        return SQLiteCache(os.path.join(self.workdir.name, 'cache.sqlite3'),
+                           {'KEY_PREFIX': 'test', **params})
+
+    def test_get_set_delete(self):
+        self.assertIsNone(self.cache.get('missing'))
+        self.cache.set('key', {'a': 1})
+        self.cache.set_many({'b': 2, 'c': None})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.assertEqual(self.cache.get_many(['key', 'b', 'c', 'x']),
+                         {'key': {'a': 1}, 'b': 2, 'c': None})
+        self.assertTrue(self.cache.delete('key'))
+        self.assertEqual(self.cache.get('key', 'gone'), 'gone')
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_versions_do_not_mix(self):
+        self.cache.set('key', 'old', version=1)
+        newer = self.make_cache(VERSION=2)
+        self.assertIsNone(newer.get('key'))
+        newer.set('key', 'new')
+        self.assertEqual(self.cache.get('key'), 'old')
+
+    def test_large_values_are_compressed(self):
+        self.assertEqual(self.cache.encode('x')[:1], PLAIN)
+        html = '<div class="card">' * 1000
+        self.assertEqual(self.cache.encode(html)[:1], COMPRESSED)
+        self.cache.set('page', html)
+        self.assertEqual(self.cache.get('page'), html)
+
+    def test_expired_entries(self):
+        self.cache.set('key', 'value', -1)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'fresh'))
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertEqual(self.cache.get('key'), 'fresh')
+
+    def test_incr_is_atomic_across_connections(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('hits')
+        self.cache.set('hits', 0)
+
+        def hit():
+            # every thread has a connection of its own, like a process
+            for _ in range(25):
+                self.cache.incr('hits')
+
+        threads = [threading.Thread(target=hit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('hits'), 100)
+        self.assertEqual(self.cache.decr('hits', 10), 90)
+
+    def test_cull_keeps_max_entries(self):
+        cache = self.make_cache(OPTIONS={'MAX_ENTRIES': 10, 'CULL_EVERY': 1})
+        for number in range(30):
+            cache.set(f'key{number}', number, 100 + number)
+        count = cache.connection.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertLessEqual(count, 11)
+        self.assertEqual(cache.get('key29'), 29)
+
+
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cache = SQLiteCache(
+            os.path.join(self.workdir.name, 'cache.sqlite3'), {})
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_only_one_caller_computes(self):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            threading.Event().wait(0.2)
+            return 'value'
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(
+            get_or_compute('hot', compute, 60, cache=self.cache)))
+        first.start()
+        started.wait()
+        results.append(get_or_compute('hot', compute, 60, cache=self.cache))
+        first.join()
+        self.assertEqual(results, ['value', 'value'])
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,156 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..caching import expires_early, page_key, recompute_cost
+from ..models import Comment, Follow, Group, Post
+from ..views import index
+
+User = get_user_model()
+
+
+class CacheViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        Post.objects.create(text='Первый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('index')
+
+    def lock_key(self):
+        request = Client().get(self.url).wsgi_request
+        return page_key(index, request)
+
+    def test_anonymous_pages_are_cached(self):
+        self.assertEqual(Client().get(self.url)['X-Cache'], 'miss')
+        self.assertEqual(Client().get(self.url)['X-Cache'], 'hit')
+        client = Client()
+        client.force_login(self.user)
+        self.assertFalse(client.get(self.url).has_header('X-Cache'))
+
+    def test_stale_page_served_while_another_regenerates(self):
+        key = self.lock_key()
+        Post.objects.create(text='Второй пост', author=self.user)
+        cache.add(f'{key}:lock', 1)
+        response = Client().get(self.url)
+        self.assertEqual(response['X-Cache'], 'stale')
+        self.assertNotContains(response, 'Второй пост')
+        cache.delete(f'{key}:lock')
+        response = Client().get(self.url)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertContains(response, 'Второй пост')
+
+    def test_recompute_cost_is_stored(self):
+        key = self.lock_key()
+        Post.objects.create(text='Второй пост', author=self.user)
+        Client().get(self.url)
+        cost = recompute_cost(key)
+        self.assertEqual(cost['recomputes'], 2)
+        self.assertEqual((cost['miss'], cost['stale']), (1, 1))
+        self.assertGreater(cost['total_seconds'], 0)
+
+    def test_early_expiry_grows_with_cost(self):
+        entry = {'expires': 100.0, 'cost': 0.1}
+        with mock.patch('posts.caching.random.random', return_value=0.5):
+            self.assertFalse(expires_early(entry, 99.0, 1.0))
+            self.assertTrue(expires_early({**entry, 'cost': 2.0}, 99.0, 1.0))
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.other_group = Group.objects.create(title='Другая', slug='other')
+        cls.post = Post.objects.create(text='Пост', author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('index'),
+            reverse('group_posts', args=[self.group.slug]),
+            reverse('profile', args=[self.user.username]),
+            reverse('post', args=[self.user.username, self.post.pk]),
+        ]
+
+    def etags(self, client=None):
+        client = client or Client()
+        return {url: client.get(url)['ETag'] for url in self.urls}
+
+    def test_unchanged_pages_answer_304_without_queries(self):
+        for url, etag in self.etags().items():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 1)
+
+    def test_if_modified_since(self):
+        response = Client().get(self.urls[0])
+        response = Client().get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_only_for_anonymous(self):
+        last_modified = Client().get(self.urls[0])['Last-Modified']
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(self.urls[0])
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('Cookie', response['Vary'])
+        response = client.get(self.urls[0],
+                              HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        response = Client().get(self.urls[0],
+                                HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_comment_changes_every_page_showing_the_post(self):
+        before = self.etags()
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=self.reader)
+        after = self.etags()
+        for url in self.urls:
+            self.assertNotEqual(before[url], after[url], url)
+
+    def test_follow_changes_profile_only(self):
+        before = self.etags()
+        Follow.objects.create(user=self.reader, author=self.user)
+        after = self.etags()
+        self.assertNotEqual(before[self.urls[2]], after[self.urls[2]])
+        self.assertEqual(before[self.urls[1]], after[self.urls[1]])
+
+    def test_moved_post_changes_old_group_page(self):
+        before = self.etags()
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertNotEqual(before[self.urls[1]], self.etags()[self.urls[1]])
+
+    def test_new_csrf_token_changes_etag(self):
+        client = Client()
+        client.force_login(self.reader)
+        url = self.urls[3]
+        response = client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        # a new login rotates the token the cached form would post
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_per_user(self):
+        client = Client()
+        client.force_login(self.reader)
+        self.assertNotEqual(self.etags(), self.etags(client))
@@ -0,0 +1,31 @@
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class SQLiteBackendTest(TestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite' or not hasattr(
+                connection, 'pragmas'):
+            self.skipTest('yatube.sqlite backend')
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -20000)
+
+
+class ImmediateTransactionTest(TransactionTestCase):
+    def test_atomic_begins_immediate(self):
+        if getattr(connection, 'transaction_mode', None) != 'IMMEDIATE':
+            self.skipTest('yatube.sqlite backend')
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
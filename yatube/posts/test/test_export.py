@@ -0,0 +1,88 @@
+import csv
+import datetime as dt
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..export import Export, ExportError
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.start = timezone.now() - dt.timedelta(days=10)
+        for number in range(5):
+            post = Post.objects.create(text=f'Пост, "{number}"',
+                                       author=cls.user, group=cls.group)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=cls.start + dt.timedelta(days=number))
+        Comment.objects.create(text='Комментарий', author=cls.user,
+                               post=post)
+
+    def test_ndjson_streams_every_row(self):
+        export = Export('posts', chunk_size=2)
+        lines = [json.loads(line) for line in export]
+        self.assertEqual([line['id'] for line in lines],
+                         sorted(Post.objects.values_list('id', flat=True)))
+        self.assertEqual(lines[0]['text'], 'Пост, "0"')
+        self.assertEqual(export.watermark, self.start + dt.timedelta(days=4))
+
+    def test_csv_has_header_and_quoting(self):
+        rows = list(csv.reader(''.join(Export('posts', 'csv')).splitlines()))
+        self.assertEqual(rows[0], ['id', 'pub_date', 'author_id',
+                                   'group_id', 'text', 'image'])
+        self.assertEqual(rows[1][4], 'Пост, "0"')
+        self.assertEqual(len(rows), 6)
+
+    def test_since_exports_only_newer_rows(self):
+        since = self.start + dt.timedelta(days=2)
+        lines = list(Export('posts', since=since))
+        self.assertEqual(len(lines), 2)
+        with self.assertRaises(ExportError):
+            Export('groups', since=since)
+        with self.assertRaises(ExportError):
+            Export('users')
+
+    def test_view_is_staff_only(self):
+        client = Client()
+        url = reverse('api:export', args=['comments'])
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(self.staff)
+        response = client.get(url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('Комментарий',
+                      b''.join(response.streaming_content).decode())
+        response = client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+        response = client.get(url, {'since': '2020-13-45T00:00'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_does_not_shadow_user_pages(self):
+        user = User.objects.create_user(username='export')
+        post = Post.objects.create(text='Текст', author=user)
+        response = Client().get(reverse('post', args=['export', post.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_command(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('export_data', 'posts', '--since',
+                     (self.start + dt.timedelta(days=3)).isoformat(),
+                     stdout=out, stderr=err)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+        self.assertIn((self.start + dt.timedelta(days=4)).isoformat(),
+                      err.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Неверная дата'):
+            call_command('export_data', 'posts', '--since',
+                         '2020-13-45T00:00', stdout=out)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..feeds import follow_feed
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(FOLLOW_FEED_STRATEGY='write', FOLLOW_FEED_SIZE=3,
+                   FOLLOW_FEED_FANOUT_LIMIT=1)
+class FanoutFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Bobby')
+        cls.author = User.objects.create_user(username='Sara')
+        cls.star = User.objects.create_user(username='Kevin')
+        cls.fan = User.objects.create_user(username='Fan')
+
+    def create_posts(self, author, count):
+        return [Post.objects.create(text=f'Пост №{item}', author=author)
+                for item in range(count)]
+
+    def test_new_posts_are_pushed_to_bounded_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = self.create_posts(self.author, 5)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 3)
+        self.assertEqual(list(follow_feed(self.reader)),
+                         posts[:-4:-1])
+
+    def test_follow_and_unfollow_rebuild_timeline(self):
+        posts = self.create_posts(self.author, 2)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(set(follow_feed(self.reader)), set(posts))
+        follow.delete()
+        self.assertFalse(follow_feed(self.reader).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_popular_author_is_merged_on_read(self):
+        Follow.objects.create(user=self.fan, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.star)
+        post = Post.objects.create(text='Звезда', author=self.star)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(follow_feed(self.reader)), [post])
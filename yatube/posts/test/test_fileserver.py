@@ -0,0 +1,119 @@
+import gzip
+import os
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from yatube.fileserver import IMMUTABLE, FileServer
+
+CSS = b'body { color: red; }\n' * 100
+
+
+class FileServerTest(SimpleTestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.static = os.path.join(self.workdir.name, 'static')
+        self.media = os.path.join(self.workdir.name, 'media')
+        self.write(self.static, 'site.css', CSS)
+        self.write(self.static, 'site.0123456789ab.css', CSS)
+        self.write(self.static, 'site.0123456789ab.css.gz',
+                   gzip.compress(CSS))
+        self.write(self.media, 'originals/posts/cat.jpg', b'EXIF')
+        self.calls = []
+        self.server = FileServer(
+            self.django, roots=[('/static/', self.static, ()),
+                                ('/media/', self.media, ('originals/',))],
+            max_age=60)
+
+    def write(self, root, name, content):
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+
+    def django(self, environ, start_response):
+        self.calls.append(environ['PATH_INFO'])
+        start_response('200 OK', [])
+        return [b'django']
+
+    def get(self, path, **headers):
+        environ = {'PATH_INFO': path, **headers}
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = int(status.split()[0])
+            response['headers'] = dict(headers)
+
+        body = b''.join(self.server(environ, start_response))
+        return response['status'], response['headers'], body
+
+    def test_serves_without_django(self):
+        status, headers, body = self.get('/static/site.css')
+        self.assertEqual((status, body), (200, CSS))
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.get('/posts/')[2], b'django')
+
+    def test_hashed_names_are_immutable_and_precompressed(self):
+        status, headers, body = self.get('/static/site.0123456789ab.css',
+                                         HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), CSS)
+
+    def test_range_requests(self):
+        status, headers, body = self.get('/static/site.css',
+                                         HTTP_RANGE='bytes=5-9')
+        self.assertEqual((status, body), (206, CSS[5:10]))
+        self.assertEqual(headers['Content-Range'], f'bytes 5-9/{len(CSS)}')
+        status, _, body = self.get('/static/site.css', HTTP_RANGE='bytes=-4')
+        self.assertEqual(body, CSS[-4:])
+        status, _, _ = self.get('/static/site.css',
+                                HTTP_RANGE=f'bytes={len(CSS)}-')
+        self.assertEqual(status, 416)
+
+    def test_conditional_requests(self):
+        _, headers, _ = self.get('/static/site.css')
+        status, _, body = self.get('/static/site.css',
+                                   HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual((status, body), (304, b''))
+        status, _, _ = self.get(
+            '/static/site.css',
+            HTTP_IF_MODIFIED_SINCE=http_date(os.path.getmtime(
+                os.path.join(self.static, 'site.css')) + 10))
+        self.assertEqual(status, 304)
+
+    def test_refuses_hidden_and_outside_files(self):
+        self.assertEqual(self.get('/media/originals/posts/cat.jpg')[0], 404)
+        self.assertEqual(self.get('/media//originals/posts/cat.jpg')[0], 404)
+        self.assertEqual(self.get('/media/./originals/posts/cat.jpg')[0],
+                         404)
+        self.assertEqual(self.get('/media/posts/.//../originals/posts/'
+                                  'cat.jpg')[0], 404)
+        self.assertEqual(self.get('/static/../media/x')[0], 404)
+        self.assertEqual(self.get('/static/missing.css')[0], 404)
+        environ = {'REQUEST_METHOD': 'POST'}
+        self.assertEqual(self.get('/static/site.css', **environ)[0], 405)
+
+    def test_refuses_links_out_of_the_root(self):
+        os.symlink(os.path.join(self.media, 'originals'),
+                   os.path.join(self.static, 'linked'))
+        self.assertEqual(self.get('/static/linked/posts/cat.jpg')[0], 404)
+
+
+class CollectStaticTest(SimpleTestCase):
+    def test_hashed_and_compressed_copies(self):
+        with tempfile.TemporaryDirectory() as root, \
+                override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            names = os.listdir(os.path.join(root, 'bootstrap', 'dist', 'css'))
+        self.assertIn('bootstrap.min.css.gz', names)
+        self.assertTrue(any(name.startswith('bootstrap.min.')
+                            and name.endswith('.css.gz') for name in names))
@@ -65,11 +65,13 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        # the upload is kept as the original until it is re-encoded
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.group.id,
-                image='posts/small.gif'
+                image='',
+                image_original='originals/posts/small.gif'
             ).exists()
         )
 
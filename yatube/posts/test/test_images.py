@@ -0,0 +1,139 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import process
+from ..imaging import reencode
+from ..models import Post
+from ..templatetags.post_thumbnails import post_thumbnail
+
+User = get_user_model()
+
+
+def photo(size=(3000, 2000), format='JPEG'):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees clockwise
+    exif[0x010F] = 'Camera maker'
+    content = io.BytesIO()
+    Image.new('RGB', size, 'red').save(content, format, exif=exif)
+    return content.getvalue()
+
+
+@override_settings(POST_IMAGE_WORKERS=0, POST_THUMBNAIL_WORKERS=0,
+                   POST_IMAGE_MAX_SIDE=800)
+class ImagePipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        override = override_settings(MEDIA_ROOT=self.workdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_reencode_caps_size_and_strips_metadata(self):
+        source = os.path.join(self.workdir.name, 'photo.jpg')
+        with open(source, 'wb') as file:
+            file.write(photo())
+        target = os.path.join(self.workdir.name, 'photo.webp')
+        width, height, size = reencode(source, target, max_side=800,
+                                       max_bytes=20 * 1024)
+        self.assertEqual((width, height), (533, 800))
+        self.assertLessEqual(size, 20 * 1024)
+        with Image.open(target) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_form_keeps_original_and_process_publishes(self):
+        upload = SimpleUploadedFile('photo.jpg', photo(), 'image/jpeg')
+        form = PostForm({'text': 'Фото'}, {'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = self.user
+        post = form.save()
+        self.assertEqual(post.image, '')
+        self.assertEqual(post.image_original.name, 'originals/posts/photo.jpg')
+        name = process(post.pk, post.image_original.name)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+        self.assertRegex(name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.webp$')
+        self.assertLess(default_storage.size(name),
+                        default_storage.size(post.image_original.name))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_form_refuses_too_many_pixels(self):
+        upload = SimpleUploadedFile('photo.png', photo((100, 100), 'PNG'),
+                                    'image/png')
+        form = PostForm({'text': 'Фото'}, {'image': upload})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_form_refuses_large_file_before_decoding(self):
+        upload = SimpleUploadedFile('photo.jpg', photo(), 'image/jpeg')
+        with mock.patch('PIL.Image.open') as open_image:
+            form = PostForm({'text': 'Фото'}, {'image': upload})
+            self.assertFalse(form.is_valid())
+        open_image.assert_not_called()
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    def test_command_adopts_legacy_images(self):
+        name = default_storage.save('posts/old.jpg', ContentFile(photo()))
+        post = Post.objects.create(text='Старое', author=self.user,
+                                   image=name)
+        out = io.StringIO()
+        call_command('process_images', '--legacy', stdout=out)
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.endswith('.webp'))
+        self.assertEqual(post.image_original.name, 'originals/posts/old.jpg')
+        self.assertFalse(default_storage.exists(name))
+        self.assertIn('Обработано картинок: 1', out.getvalue())
+
+
+@override_settings(POST_IMAGE_WORKERS=0, POST_THUMBNAIL_WORKERS=0)
+class ImageClearTest(TransactionTestCase):
+    """The original is deleted on commit, which TestCase never reaches."""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        override = override_settings(MEDIA_ROOT=self.workdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_clearing_the_image_drops_the_original(self):
+        upload = SimpleUploadedFile('photo.jpg', photo(), 'image/jpeg')
+        form = PostForm({'text': 'Фото'}, {'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = User.objects.create_user(username='Bobby')
+        post = form.save()
+        original = post.image_original.name
+        process(post.pk, original)
+        post.refresh_from_db()
+        form = PostForm({'text': 'Без фото', 'image-clear': 'on'},
+                        instance=post)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image, '')
+        self.assertFalse(post.image_original)
+        self.assertFalse(default_storage.exists(original))
+        self.assertEqual(post_thumbnail(post), {'pending': False})
+        out = io.StringIO()
+        call_command('process_images', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.image, '')
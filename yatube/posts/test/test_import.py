@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, UserStats
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class ImportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        media = os.path.join(self.workdir.name, 'media')
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, name, content):
+        path = os.path.join(self.workdir.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, table, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_data', table, path, '--chunk-size', '2', *args,
+                     stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_posts_with_dates_groups_and_images(self):
+        self.write('cat.gif', 'GIF89a')
+        rows = [
+            {'id': 100, 'author': 'Bobby', 'text': 'Старый пост',
+             'pub_date': '2015-03-01T10:00:00', 'group': 'group',
+             'image': 'cat.gif'},
+            {'author': 'Bobby', 'text': 'Без группы'},
+            {'author': 'Nobody', 'text': 'Чужой'},
+            {'author': 'Bobby', 'text': 'Не туда', 'group': 'missing'},
+        ]
+        path = self.write('posts.ndjson',
+                          '\n'.join(json.dumps(row) for row in rows))
+        out, err = self.load('posts', path)
+        self.assertIn('Загружено строк: 2, пропущено: 2', out)
+        self.assertIn('поисковый индекс', out)
+        self.assertIn('posts.ndjson:3: нет пользователя Nobody', err)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, self.group)
+        self.assertRegex(post.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count,
+                         2)
+        self.assertEqual(len(search_posts('Старый').object_list), 1)
+
+    def test_taken_and_repeated_ids_are_reported(self):
+        Post.objects.create(id=7, text='Уже есть', author=self.user)
+        rows = [
+            {'id': 7, 'author': 'Bobby', 'text': 'Занятый'},
+            {'id': 8, 'author': 'Bobby', 'text': 'Первый'},
+            {'id': 8, 'author': 'Bobby', 'text': 'Повтор'},
+            {'author': 'Bobby', 'text': 'Без номера'},
+        ]
+        path = self.write('posts.ndjson',
+                          '\n'.join(json.dumps(row) for row in rows))
+        out, err = self.load('posts', path)
+        self.assertIn('Загружено строк: 2, пропущено: 2', out)
+        self.assertIn('posts.ndjson:1: не записана', err)
+        self.assertIn('posts.ndjson:3: не записана', err)
+        self.assertEqual(Post.objects.get(pk=7).text, 'Уже есть')
+        self.assertEqual(Post.objects.get(pk=8).text, 'Первый')
+        self.assertTrue(Post.objects.filter(text='Без номера').exists())
+        Post.objects.create(text='После загрузки', author=self.user)
+
+    def test_comments_and_follows_from_csv(self):
+        post = Post.objects.create(text='Пост', author=self.user)
+        path = self.write('comments.csv',
+                          'post,author,text,created\n'
+                          f'{post.pk},Reader,"Ну, да",2020-01-01T00:00:00\n'
+                          '999,Reader,Мимо,\n')
+        out, err = self.load('comments', path)
+        self.assertEqual(Comment.objects.get().text, 'Ну, да')
+        self.assertIn('нет записи 999', err)
+        path = self.write('follows.csv', 'user,author\nReader,Bobby\n'
+                                         'Reader,Bobby\nBobby,Bobby\n')
+        self.load('follows', path, '--no-rebuild')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.load('follows', path)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).followers_count, 1)
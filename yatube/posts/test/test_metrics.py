@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube import metrics
+from yatube.counters import SharedCounters
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        Post.objects.create(text='Привет', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_records_view_queries_templates_and_cache(self):
+        response = Client().get(reverse('index'))
+        report = response.wsgi_request.metrics
+        self.assertEqual(report['view'], 'index')
+        self.assertEqual(report['status'], 200)
+        self.assertGreater(report['queries'], 0)
+        self.assertGreater(report['template_seconds'], 0)
+        self.assertGreater(report['cache_misses'], 0)
+        report = Client().get(reverse('index')).wsgi_request.metrics
+        self.assertGreater(report['cache_hits'], 0)
+
+    def test_counts_duplicate_queries(self):
+        request_metrics = metrics.RequestMetrics()
+        for pk in (1, 2, 1, 1):
+            request_metrics.record_query('SELECT %s', (pk,), 0.001)
+        self.assertEqual(request_metrics.duplicate_queries(), 2)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs('yatube.requests', 'WARNING') as logs:
+            Client().get(reverse('profile', args=[self.user.username]))
+        self.assertIn('Slow request profile', logs.output[0])
+        self.assertIn('SELECT', logs.output[1])
+
+    def test_sampled_export(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'requests.jsonl')
+            with self.settings(REQUEST_METRICS_FILE=path,
+                               REQUEST_METRICS_SAMPLE_RATE=1):
+                Client().get(reverse('index'))
+            with self.settings(REQUEST_METRICS_FILE=path,
+                               REQUEST_METRICS_SAMPLE_RATE=0):
+                Client().get(reverse('index'))
+            with open(path) as exported:
+                lines = exported.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['view'], 'index')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_endpoint(self):
+        Client().get(reverse('index'))
+        response = Client().get(reverse('metrics'),
+                                HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(
+            response, 'yatube_request_requests_total{view="index"} 1')
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="index"} 1')
+        # behind the proxy every request comes from 127.0.0.1
+        response = Client(REMOTE_ADDR='127.0.0.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = Client().get(reverse('metrics'),
+                                HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        staff = User.objects.create_user(username='Staff', is_staff=True)
+        client = Client()
+        client.force_login(staff)
+        self.assertEqual(client.get(reverse('metrics')).status_code, 200)
+
+    def test_prometheus_endpoint_closed_without_token(self):
+        response = Client().get(reverse('metrics'),
+                                HTTP_AUTHORIZATION='Bearer None')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_FLUSH=60)
+    def test_totals_are_summed_over_processes(self):
+        workers = [SharedCounters('metrics:test') for _ in range(2)]
+        self.addCleanup(workers[0].clear)
+        workers[0].add({('index', 'requests'): 2})
+        workers[1].add({('index', 'requests'): 1, ('group', 'requests'): 1})
+        # the second worker has not flushed yet
+        self.assertEqual(workers[0].values(), {('index', 'requests'): 2})
+        self.assertEqual(workers[1].values(), {
+            ('index', 'requests'): 3, ('group', 'requests'): 1})
+        self.assertEqual(workers[0].values(), workers[1].values())
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 
-from ..models import Post, Group
+from ..models import Comment, Follow, Post, Group, UserStats
 
 User = get_user_model()
 
@@ -36,3 +39,37 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         title = group.title
         self.assertEqual(title, self.group.title)
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.reader = User.objects.create_user(username='Sara')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(text='Привет', author=self.user)
+        Comment.objects.create(post=post, author=self.reader, text='Ура')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
+
+    def test_rebuild_command_reconciles_counters(self):
+        Post.objects.create(text='Привет', author=self.user)
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
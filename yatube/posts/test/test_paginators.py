@@ -0,0 +1,155 @@
+import base64
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+
+from ..management.commands.explain_feeds import Command as ExplainFeeds
+from ..models import Comment, Follow, Group, Post
+from ..paginators import CachedCountPaginator, CursorPaginator
+from ..templatetags.paginate import page_window
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        for number in range(25):
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walks_forward_and_back(self):
+        first = self.paginator.get_page(None)
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(list(first), self.expected[:10])
+        self.assertEqual(list(second), self.expected[10:20])
+        self.assertEqual(list(third), self.expected[20:])
+        self.assertIsNone(first.previous_cursor)
+        self.assertIsNone(third.next_cursor)
+        back = self.paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), self.expected[10:20])
+        self.assertEqual(
+            list(self.paginator.get_page(back.previous_cursor)),
+            self.expected[:10])
+
+    def test_invalid_cursor_returns_first_page(self):
+        for cursor in ('garbage', 'W10', 'WyJuIiwgWzFdXQ'):
+            with self.subTest(cursor=cursor):
+                page = self.paginator.get_page(cursor)
+                self.assertEqual(list(page), self.expected[:10])
+
+    def test_crafted_cursor_returns_first_page(self):
+        for values in ([[1], 5], [None, None], [{}, 'x'], ['2020-13-45', 1]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(['n', values]).encode()).decode()
+            with self.subTest(values=values):
+                page = self.paginator.get_page(cursor)
+                self.assertEqual(list(page), self.expected[:10])
+                for url in (reverse('index'), reverse('api:posts')):
+                    response = Client().get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_page_never_counts(self):
+        first = self.paginator.get_page(None)
+        with CaptureQueriesContext(connection) as queries:
+            self.paginator.get_page(first.next_cursor)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'].upper())
+        self.assertNotIn('OFFSET', queries[0]['sql'].upper())
+
+    def test_index_renders_cursor_links(self):
+        response = Client().get(reverse('index'))
+        page = response.context['page']
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+        response = Client().get(
+            reverse('index'), {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['page']),
+                         self.expected[10:20])
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        for number in range(25):
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self):
+        paginator = CachedCountPaginator(self.user.posts.all(), 10)
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        return count, len(queries)
+
+    def test_count_is_cached_until_posts_change(self):
+        self.assertEqual(self.count_queries(), (25, 1))
+        self.assertEqual(self.count_queries(), (25, 0))
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(self.count_queries(), (26, 1))
+
+    @override_settings(PAGINATOR_ESTIMATE_THRESHOLD=1)
+    def test_unfiltered_count_is_estimated(self):
+        Post.objects.filter(pk=Post.objects.order_by('pk').first().pk).delete()
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count,
+                         Post.objects.order_by('-pk').first().pk)
+        filtered = CachedCountPaginator(self.user.posts.all(), 10)
+        self.assertEqual(filtered.count, 24)
+
+    def test_page_window(self):
+        paginator = CachedCountPaginator(Post.objects.all(), 1)
+        self.assertEqual(page_window(paginator.page(1)), [1, 2, 3, None, 25])
+        self.assertEqual(page_window(paginator.page(12)),
+                         [1, None, 10, 11, 12, 13, 14, None, 25])
+        self.assertEqual(page_window(paginator.page(24), 1),
+                         [1, None, 23, 24, 25])
+
+    @override_settings(POSTS_PAGINATION='numbered', POSTS_PER_PAGE=1)
+    def test_numbered_links_are_windowed(self):
+        response = Client().get(reverse('index'), {'page': 12})
+        self.assertContains(response, 'class="page-link"', count=11)
+        self.assertContains(response, '?page=25')
+        self.assertNotContains(response, '?page=5"')
+
+
+class ExplainFeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        reader = User.objects.create_user(username='Reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=reader, author=cls.user)
+        post = Post.objects.create(text='Пост', author=cls.user, group=group)
+        Comment.objects.create(text='Комментарий', author=reader, post=post)
+
+    def test_feed_plans_use_indexes(self):
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('post_comments (курсор): ок', out.getvalue())
+
+    def test_full_scan_is_a_problem(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite plan format')
+        self.assertTrue(ExplainFeeds.is_problem('2 0 0 SCAN posts_post'))
+        self.assertTrue(ExplainFeeds.is_problem(
+            '9 0 0 USE TEMP B-TREE FOR ORDER BY'))
+        self.assertFalse(ExplainFeeds.is_problem(
+            '2 0 0 SCAN posts_post USING INDEX post_pub_date_idx'))
@@ -0,0 +1,112 @@
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import queue
+from ..models import Task, UserStats
+
+User = get_user_model()
+
+calls = []
+
+
+@queue.task(retries=2, backoff=10)
+def record(value):
+    calls.append(value)
+
+
+@queue.task(retries=1, backoff=10)
+def fail():
+    raise RuntimeError('сломалось')
+
+
+@override_settings(TASKS_MODE='workers')
+class QueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+
+    def setUp(self):
+        calls.clear()
+
+    def test_writes_enqueue_side_effects(self):
+        self.user.posts.create(text='Текст')
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 0)
+        self.assertTrue(Task.objects.filter(
+            name='posts.tasks.sync_search', status=Task.PENDING).exists())
+        self.assertGreaterEqual(queue.drain(), 2)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+    def test_stats_task_may_run_again(self):
+        self.user.posts.create(text='Раз')
+        self.user.posts.create(text='Два')
+        recounts = Task.objects.filter(name='posts.tasks.recount_stats')
+        self.assertEqual(recounts.count(), 1)
+        queue.drain()
+        # as if the lease ran out after the first run had committed
+        recounts.update(status=Task.PENDING, run_at=timezone.now())
+        self.assertEqual(queue.drain(), 1)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 2)
+
+    def test_key_keeps_one_pending_task(self):
+        record.enqueue(1, key='record')
+        record.enqueue(2, key='record')
+        record.enqueue(3)
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(queue.drain(), 2)
+        self.assertEqual(calls, [1, 3])
+        record.enqueue(4, key='record')
+        self.assertEqual(queue.drain(), 1)
+
+    def test_failure_is_retried_with_backoff(self):
+        fail.enqueue()
+        with self.assertLogs('posts.queue', 'ERROR'):
+            self.assertEqual(queue.drain(), 1)
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertIn('RuntimeError: сломалось', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(queue.drain(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('posts.queue', 'ERROR'):
+            self.assertEqual(queue.drain(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_expired_lease_is_taken_over(self):
+        record.enqueue(1, key='record')
+        self.assertEqual(len(queue.claim('dead')), 1)
+        self.assertEqual(queue.drain(), 0)
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(queue.drain(), 1)
+        self.assertEqual(calls, [1])
+
+    def test_requeued_task_merges_with_pending_one(self):
+        record.enqueue(1, key='record')
+        claimed = queue.claim('dead')
+        record.enqueue(2, key='record')
+        Task.objects.filter(pk=claimed[0].pk).update(
+            locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(queue.drain(), 1)
+        self.assertEqual(calls, [2])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_eager_mode_runs_at_once(self):
+        with self.settings(TASKS_MODE='eager'):
+            record.enqueue(1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_run_workers_burst(self):
+        record.enqueue(1)
+        out = io.StringIO()
+        call_command('run_workers', '--burst', stdout=out)
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+        self.assertEqual(calls, [1])
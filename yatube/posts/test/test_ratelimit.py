@@ -0,0 +1,127 @@
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube import metrics, ratelimit
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+LIMITS = {
+    'add_comment': {'user': (2, 60), 'ip': (3, 60)},
+    'profile_follow': {'user': (1, 60)},
+    'signup': {'ip': (1, 60)},
+}
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS=LIMITS)
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Привет', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        ratelimit.reset()
+        self.client = self.login(self.user)
+        self.url = reverse('add_comment', args=[self.user.username,
+                                                self.post.pk])
+
+    @staticmethod
+    def login(user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_rejects_over_limit_without_queries(self):
+        for text in ('Раз', 'Два'):
+            response = self.client.post(self.url, {'text': text})
+            self.assertEqual(response.status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'text': 'Три'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 121))
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(ratelimit.counts(), {
+            'add_comment': {'allowed': 2, 'rejected': 1}})
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_address_is_shared_between_users(self):
+        self.client.post(self.url, {'text': 'Раз'})
+        self.client.post(self.url, {'text': 'Два'})
+        reader = self.login(self.reader)
+        self.assertEqual(
+            reader.post(self.url, {'text': 'Три'}).status_code, 302)
+        self.assertEqual(
+            reader.post(self.url, {'text': 'Четыре'}).status_code, 429)
+
+    def test_window_slides(self):
+        keys = {'limit': (2, 60)}
+        self.assertEqual(ratelimit.take(keys, now=0), 0)
+        self.assertEqual(ratelimit.take(keys, now=10), 0)
+        self.assertEqual(ratelimit.take(keys, now=15), 45 + 30)
+        # two in the last window, weighted by the half of it still covered
+        self.assertEqual(ratelimit.take(keys, now=75), 15)
+        self.assertEqual(ratelimit.take(keys, now=90), 0)
+        self.assertEqual(ratelimit.take(keys, now=91), 29)
+
+    def flood(self, keys, requests=20):
+        """Waits of ``requests`` taken at the same moment from threads."""
+        start = threading.Barrier(requests)
+        waits = []
+
+        def request():
+            start.wait()
+            waits.append(ratelimit.take(keys))
+
+        threads = [threading.Thread(target=request) for _ in range(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return waits
+
+    def test_concurrent_requests_share_no_slot(self):
+        self.assertEqual(self.flood({'limit': (5, 60)}).count(0), 5)
+        with tempfile.TemporaryDirectory() as workdir:
+            caches = {**settings.CACHES, 'limits': {
+                'BACKEND': 'yatube.cache.SQLiteCache',
+                'LOCATION': os.path.join(workdir, 'cache.sqlite3')}}
+            with self.settings(CACHES=caches, RATE_LIMIT_CACHE='limits'):
+                self.assertEqual(self.flood({'limit': (5, 60)}).count(0), 5)
+
+    def test_follow_and_signup(self):
+        follow = reverse('profile_follow', args=[self.reader.username])
+        self.assertEqual(self.client.get(follow).status_code, 302)
+        self.assertEqual(self.client.get(follow).status_code, 429)
+        guest = Client()
+        self.assertEqual(guest.get(reverse('signup')).status_code, 200)
+        data = {'username': 'Spam', 'password1': 'Ja8sd7fhQ',
+                'password2': 'Ja8sd7fhQ'}
+        guest.post(reverse('signup'), data)
+        data['username'] = 'Spam2'
+        self.assertEqual(
+            guest.post(reverse('signup'), data).status_code, 429)
+        self.assertFalse(User.objects.filter(username='Spam2').exists())
+
+    def test_counters_in_metrics(self):
+        ratelimit.count('add_comment', 'rejected')
+        self.assertIn(
+            'yatube_rate_limit_requests_total{endpoint="add_comment",'
+            'result="rejected"} 1', metrics.prometheus_text())
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_can_be_turned_off(self):
+        for text in ('Раз', 'Два', 'Три'):
+            response = self.client.post(self.url, {'text': text})
+            self.assertEqual(response.status_code, 302)
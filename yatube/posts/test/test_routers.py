@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from yatube.routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DB_REPLICAS=['replica_1'])
+class ReplicaRouterTest(SimpleTestCase):
+    def read_alias(self, request, write=False):
+        router = ReplicaRouter()
+        seen = {}
+
+        def view(request):
+            if write:
+                router.db_for_write(Post)
+            seen['alias'] = router.db_for_read(Post)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return seen['alias'], response
+
+    def test_safe_requests_read_from_replica(self):
+        alias, response = self.read_alias(RequestFactory().get('/'))
+        self.assertEqual(alias, 'replica_1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_unsafe_requests_use_primary(self):
+        alias, _ = self.read_alias(RequestFactory().post('/'))
+        self.assertEqual(alias, 'default')
+
+    def test_write_pins_to_primary(self):
+        alias, response = self.read_alias(RequestFactory().get('/'),
+                                          write=True)
+        self.assertEqual(alias, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read_alias(request)[0], 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')
+
+
+@override_settings(DB_REPLICAS=['replica_1'])
+class ReplicaPinTest(TestCase):
+    def test_comment_pins_author_to_primary(self):
+        user = User.objects.create_user(username='Bobby')
+        post = Post.objects.create(text='Привет', author=user)
+        client = Client()
+        client.force_login(user)
+        response = client.post(
+            reverse('add_comment', args=[user.username, post.pk]),
+            {'text': 'Комментарий'})
+        self.assertIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SimpleSearchBackend, SearchPaginator
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.cats = [
+            Post.objects.create(text=f'Кошка номер {number}', author=cls.user)
+            for number in range(12)
+        ]
+        cls.dog = Post.objects.create(text='Собака лает', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_search_finds_ranked_paginated_posts(self):
+        response = Client().get(reverse('search'), {'q': 'кошк'})
+        page = response.context['page']
+        self.assertEqual(len(page), 10)
+        self.assertNotIn(self.dog, page)
+        response = Client().get(reverse('search'),
+                                {'q': 'кошк', 'cursor': page.next_cursor})
+        rest = response.context['page']
+        self.assertEqual(len(rest), 2)
+        self.assertEqual(set(page) | set(rest), set(self.cats))
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%88%D0%BA')
+
+    def test_search_without_results_says_so(self):
+        response = Client().get(reverse('search'), {'q': 'жираф'})
+        self.assertContains(response, 'По запросу «жираф» ничего не найдено')
+        response = Client().get(reverse('search'))
+        self.assertNotContains(response, 'ничего не найдено')
+
+    def test_index_follows_edits_and_deletes(self):
+        self.dog.text = 'Собака спит'
+        self.dog.save()
+        self.assertEqual(list(SearchPaginator('спит', 10).get_page(None)),
+                         [self.dog])
+        self.assertFalse(SearchPaginator('лает', 10).get_page(None))
+        Post.objects.filter(pk=self.cats[0].pk).delete()
+        page = SearchPaginator('кошка', 20).get_page(None)
+        self.assertEqual(len(page), 11)
+
+    def test_simple_backend_pages_newest_first(self):
+        paginator = SearchPaginator('номер', 5, SimpleSearchBackend())
+        first = paginator.get_page(None)
+        self.assertEqual(list(first), self.cats[:-6:-1])
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(second), self.cats[-6:-11:-1])
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..models import Post
+from ..thumbnails import KEY, generate
+from ..versions import touch
+
+User = get_user_model()
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+class PostThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.post = Post.objects.create(text='Привет', author=cls.user,
+                                       image='posts/small.gif')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_while_pending(self):
+        response = Client().get(reverse('index'))
+        self.assertContains(response, 'Миниатюра ещё готовится')
+        self.assertNotContains(response, '<img')
+
+    def test_renders_precomputed_urls(self):
+        cache.set_many({
+            KEY.format('card', 'posts/small.gif'): '/media/card.gif',
+            KEY.format('mobile', 'posts/small.gif'): '/media/mobile.gif',
+        })
+        touch(f'post:{self.post.pk}')
+        response = Client().get(reverse('index'))
+        self.assertContains(response, 'src="/media/card.gif"')
+        self.assertContains(response, '/media/mobile.gif 480w')
+
+    def test_generate_refreshes_feeds(self):
+        etag = Client().get(reverse('index'))['ETag']
+        thumbnail = mock.Mock(url='/media/card.gif')
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        return_value=thumbnail):
+            generate('posts/small.gif')
+        response = Client().get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'src="/media/card.gif"')
+
+
+class ScheduleTest(TransactionTestCase):
+    """Thumbnails are scheduled on commit, which TestCase never reaches."""
+
+    def test_scheduled_only_when_the_image_changes(self):
+        user = User.objects.create_user(username='Bobby')
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            post = Post.objects.create(text='Привет', author=user,
+                                       image='posts/small.gif')
+            schedule.assert_called_once_with('posts/small.gif')
+            post.text = 'Пока'
+            post.save()
+            self.assertEqual(schedule.call_count, 1)
+            post.image = 'posts/other.gif'
+            post.save()
+            schedule.assert_called_with('posts/other.gif')
+            self.assertEqual(schedule.call_count, 2)
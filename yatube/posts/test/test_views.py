@@ -4,14 +4,16 @@ import tempfile
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -84,7 +86,7 @@ class PostCreateFormTests(TestCase):
         post_text_0 = first_object.text
         post_image_0 = first_object.image
         self.assertEqual(post_text_0, self.post.text)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.post.image)
 
     def test_group_pages_show_correct_context(self):
         response = self.authorized_client.get(
@@ -98,7 +100,7 @@ class PostCreateFormTests(TestCase):
         post_text_0 = first_object.text
         post_image_0 = first_object.image
         self.assertEqual(post_text_0, self.post.text)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.post.image)
 
     def test_new_shows_correct_context(self):
         response = self.authorized_client.get(reverse('new_post'))
@@ -133,7 +135,7 @@ class PostCreateFormTests(TestCase):
         post_text_0 = first_object.text
         post_image_0 = first_object.image
         self.assertEqual(post_text_0, self.post.text)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.post.image)
 
     def test_userd_post_id_shows_correct_context(self):
         response = self.authorized_client.get(
@@ -143,7 +145,7 @@ class PostCreateFormTests(TestCase):
         post_text_0 = first_object.text
         post_image_0 = first_object.image
         self.assertEqual(post_text_0, self.post.text)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.post.image)
 
     def test_post_shows_on_main(self):
         response = self.authorized_client.get(reverse('index'))
@@ -255,3 +257,136 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse(
             'group_posts', kwargs={'slug': f'{self.group.slug}'}) + '?page=2')
         self.assertEqual(len(response.context.get('page')), 5)
+
+
+class FeedQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Bobby')
+        cls.author = User.objects.create_user(username='Sara')
+        cls.group = Group.objects.create(
+            title='Bobbys posts',
+            description='Посты Бобби',
+            slug='bobbys'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_posts(self, count):
+        for item in range(count):
+            post = Post.objects.create(text=f'Пост №{item}',
+                                       author=self.author, group=self.group)
+            Comment.objects.create(post=post, author=self.reader,
+                                   text='Комментарий')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_reader.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+        )
+        self.add_posts(1)
+        budget = {url: self.count_queries(url) for url in urls}
+        self.add_posts(9)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), budget[url])
+                self.assertLessEqual(budget[url], 5)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.user2 = User.objects.create_user(username='Sara')
+        cls.group = Group.objects.create(
+            title='Bobbys posts',
+            description='Посты Бобби',
+            slug='bobbys'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(text='Привет', author=self.user,
+                                        group=self.group)
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.user2)
+
+    def test_cached_card_keeps_per_user_links(self):
+        edit_url = reverse('post_edit', kwargs={'username': self.user,
+                                                'post_id': self.post.id})
+        self.assertContains(self.author_client.get(reverse('index')),
+                            edit_url)
+        self.assertNotContains(self.reader_client.get(reverse('index')),
+                               edit_url)
+
+    def test_card_is_invalidated_by_changes(self):
+        self.reader_client.get(reverse('index'))
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        self.group.title = 'Новое название'
+        self.group.save()
+        Comment.objects.create(post=self.post, author=self.user2, text='Ура')
+        response = self.reader_client.get(reverse('index'))
+        self.assertContains(response, 'Исправленный текст')
+        self.assertContains(response, 'Новое название')
+        self.assertContains(response, 'Комментариев: 1')
+
+
+@override_settings(COMMENTS_PER_PAGE=10)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Bobby')
+        cls.post = Post.objects.create(text='Привет', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий №{item}')
+            for item in range(15)
+        ]
+        cls.post_url = reverse('post', kwargs={'username': cls.user,
+                                               'post_id': cls.post.id})
+        cls.more_url = reverse('post_comments',
+                               kwargs={'username': cls.user,
+                                       'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_comments_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.post_url)
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:10])
+        self.assertContains(response, comments.next_cursor)
+        self.assertLessEqual(len(queries), 3)
+
+    def test_load_more_fragment_and_json(self):
+        cursor = self.client.get(self.post_url).context['comments'].next_cursor
+        response = self.client.get(self.more_url, {'cursor': cursor})
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[10:])
+        self.assertNotContains(response, '<html')
+        response = self.client.get(self.more_url,
+                                   {'cursor': cursor, 'format': 'json'})
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['comments']],
+                         [comment.id for comment in self.comments[10:]])
+        self.assertIsNone(data['next_cursor'])
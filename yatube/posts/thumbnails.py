@@ -0,0 +1,86 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from sorl.thumbnail import get_thumbnail
+
+from .models import Post
+from .versions import touch
+
+logger = logging.getLogger(__name__)
+
+# alias -> sorl geometry and options
+SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'mobile': ('480x170', {'crop': 'center', 'upscale': True}),
+}
+KEY = 'thumbnail:{}:{}'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def generate(name):
+    """Render every size of image ``name`` and publish their URLs.
+
+    Cards and feed pages showing the image are cached with a placeholder
+    until then, so their versions are bumped once the URLs are in place.
+    """
+    urls = {}
+    for alias, (geometry, options) in SIZES.items():
+        thumbnail = get_thumbnail(name, geometry, **options)
+        if not thumbnail.exists():
+            raise FileNotFoundError(f'{name} не удалось прочитать')
+        urls[KEY.format(alias, name)] = thumbnail.url
+    cache.set_many(urls, None)
+    scopes = {'feeds'}
+    for pk, author_id, group_id in Post.objects.filter(
+            image=name).values_list('pk', 'author_id', 'group_id'):
+        scopes.update((f'post:{pk}', f'author:{author_id}'))
+        if group_id:
+            scopes.add(f'group-posts:{group_id}')
+    touch(*scopes)
+
+
+def schedule(name):
+    """Generate thumbnails of ``name`` in the background worker pool."""
+    global _executor
+    if not settings.POST_THUMBNAIL_WORKERS:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+    _executor.submit(_run, name)
+
+
+def _run(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connection.close()
+
+
+def thumbnail_urls(name):
+    """Return ``{alias: url}`` of ready thumbnails or ``None`` if pending.
+
+    Never renders anything itself: missing thumbnails are scheduled.
+    """
+    keys = {KEY.format(alias, name): alias for alias in SIZES}
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        schedule(name)
+        return None
+    return {alias: found[key] for key, alias in keys.items()}
@@ -0,0 +1,44 @@
+import time
+
+from django.core.cache import cache
+
+KEY = 'version:{}'
+
+
+def touch(*scopes):
+    """Mark ``scopes`` (e.g. ``'post:1'``) as changed right now."""
+    now = time.time()
+    cache.set_many({KEY.format(scope): now for scope in scopes}, None)
+
+
+def get_versions(scopes):
+    """Return a ``{scope: version}`` dict with a single cache round trip.
+
+    A version is the time of the last change of its scope. Scopes never
+    touched, or evicted from the cache, start a fresh version, which only
+    costs a cache miss on whatever was keyed by the old one.
+    """
+    keys = {KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in keys.keys() - found.keys():
+        cache.add(key, now, None)
+        found[key] = cache.get(key, now)
+    return {scope: found[key] for key, scope in keys.items()}
+
+
+def card_scopes(post):
+    scopes = [f'post:{post.pk}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def attach_card_versions(posts):
+    """Set ``card_version`` on every post used by the card fragment cache."""
+    posts = list(posts)
+    versions = get_versions(
+        scope for post in posts for scope in card_scopes(post))
+    for post in posts:
+        post.card_version = '-'.join(
+            str(versions[scope]) for scope in card_scopes(post))
@@ -1,20 +1,63 @@
-from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from django.views.decorators.cache import cache_page
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.http import StreamingHttpResponse
+from django.db import transaction
 
+from yatube.ratelimit import rate_limit
+
+from .caching import cache_view, conditional_page
+from .export import FORMATS, Export, ExportError, parse_since
 from .models import Post, Group, User, Follow
+from .feeds import follow_feed
 from .forms import PostForm, CommentForm
+from .paginators import CursorPaginator, paginate
+from .search import search_posts
+from .versions import attach_card_versions
+
+
+def page_group(request, slug):
+    """Group of a group page, loaded once for the ETag and the view."""
+    if not hasattr(request, '_page_group'):
+        request._page_group = get_object_or_404(Group, slug=slug)
+    return request._page_group
+
+
+def page_author(request, username):
+    """Author of a profile page, loaded once for the ETag and the view."""
+    if not hasattr(request, '_page_author'):
+        request._page_author = get_object_or_404(
+            User.objects.select_related('stats'), username=username)
+    return request._page_author
+
+
+def index_scopes(request):
+    return ['feeds', 'comments', 'groups']
+
+
+def group_scopes(request, slug):
+    return [f'group-posts:{page_group(request, slug).pk}']
+
+
+def profile_scopes(request, username):
+    return [f'author:{page_author(request, username).pk}', 'groups']
+
 
+def post_scopes(request, username, post_id):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return [f'post:{post_id}', f'author:{author_id}', 'groups']
 
-@cache_page(20)
+
+@conditional_page(index_scopes)
+@cache_view(settings.VIEW_CACHE_TIMEOUT)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list)
+    attach_card_versions(page)
     return render(
         request,
         'index.html',
@@ -22,34 +65,38 @@ def index(request):
     )
 
 
+@conditional_page(group_scopes)
+@cache_view(settings.VIEW_CACHE_TIMEOUT)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    group = page_group(request, slug)
+    posts = group.posts.for_feed()
+    page = paginate(request, posts)
+    attach_card_versions(page)
     return render(request, 'group.html', {'group': group, 'page': page})
 
 
+@conditional_page(profile_scopes)
+@cache_view(settings.VIEW_CACHE_TIMEOUT)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = page_author(request, username)
+    posts = author.posts.for_feed()
     user = request.user
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, posts)
+    attach_card_versions(page)
     following = user.is_authenticated and (
         Follow.objects.filter(user=user, author=author).exists())
     return render(request, 'profile.html', {'author': author, 'page': page,
                                             'following': following})
 
 
+@conditional_page(post_scopes)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    author = get_object_or_404(User, username=username)
+    posts = Post.objects.for_feed().select_related('author__stats')
+    post = get_object_or_404(posts, author__username=username, pk=post_id)
+    author = post.author
     user = request.user
     form = CommentForm()
-    comments = post.comments.all()
+    comments = comment_page(post, request.GET.get('cursor'))
     following = user.is_authenticated and (
         Follow.objects.filter(user=user, author=author).exists())
     return render(request, 'post.html', {'post': post, 'author': author,
@@ -57,7 +104,33 @@ def post_view(request, username, post_id):
                                          'following': following})
 
 
+def comment_page(post, cursor):
+    """Page of ``post`` comments in posting order, authors included."""
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                settings.COMMENTS_PER_PAGE,
+                                ordering=('created', 'id'))
+    return paginator.get_page(cursor)
+
+
+def post_comments(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, pk=post_id)
+    comments = comment_page(post, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{'id': item.id,
+                          'author': item.author.username,
+                          'text': item.text,
+                          'created': item.created} for item in comments],
+            'next_cursor': comments.next_cursor,
+        })
+    return render(request, 'includes/comment_list.html',
+                  {'post': post, 'comments': comments})
+
+
+@rate_limit('new_post')
 @login_required
+@transaction.atomic
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if not form.is_valid():
@@ -68,6 +141,7 @@ def new_post(request):
     return redirect('index')
 
 
+@rate_limit('post_edit')
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
@@ -76,12 +150,21 @@ def post_edit(request, username, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        post.save()
+        form.save()
         return redirect('post', username=username, post_id=post_id)
     return render(request, 'new.html', {'form': form, 'post': post,
                   'is_edit': True})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        page = search_posts(query, request.GET.get('cursor'))
+        attach_card_versions(page)
+    return render(request, 'search.html', {'query': query, 'page': page})
+
+
 def page_not_found(request, exception=None):
     return render(
         request,
@@ -95,7 +178,9 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
+@rate_limit('add_comment')
 @login_required
+@transaction.atomic
 def add_comment(request, post_id, username):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     form = CommentForm(request.POST or None)
@@ -105,7 +190,7 @@ def add_comment(request, post_id, username):
         comment.author = request.user
         comment.save()
         return redirect('post', post_id=post.id, username=post.author.username)
-    comments = post.comments.all()
+    comments = comment_page(post, None)
     context = {'form': form,
                'comments': comments,
                'post': post}
@@ -115,14 +200,15 @@ def add_comment(request, post_id, username):
 @login_required
 def follow_index(request):
     user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = follow_feed(user)
+    page = paginate(request, post_list)
+    attach_card_versions(page)
     return render(request, 'follow.html', {'page': page})
 
 
+@rate_limit('profile_follow', methods=('GET', 'POST'))
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -133,7 +219,9 @@ def profile_follow(request, username):
     return redirect('profile', username=username)
 
 
+@rate_limit('profile_unfollow', methods=('GET', 'POST'))
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -142,3 +230,16 @@ def profile_unfollow(request, username):
         return redirect('profile', author.username)
     else:
         return redirect('index')
+
+
+@staff_member_required
+def export(request, table):
+    format = request.GET.get('format', 'ndjson')
+    try:
+        lines = Export(table, format, parse_since(request.GET.get('since')))
+    except ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(lines, content_type=FORMATS[format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{format}"')
+    return response
@@ -0,0 +1,201 @@
+"""Shared cache backend and helpers.
+
+``SQLiteCache`` keeps entries in one SQLite file, so every worker process
+on the host shares a warm cache without running a cache server. Pickled
+values of ``COMPRESS_MIN_LENGTH`` bytes and more, rendered pages mostly,
+are stored zlib-compressed.
+
+``get_or_compute`` guards hot keys against a cache stampede.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import zlib
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+PLAIN = b'p'
+COMPRESSED = b'z'
+
+MISSING = object()
+
+
+class SQLiteCache(BaseCache):
+    """Cache table in the SQLite file named by ``LOCATION``.
+
+    Every thread keeps its own connection to the file in WAL mode, so
+    readers never wait for writers. Expired rows are skipped on read and
+    removed by the cull that runs on one ``set()`` in ``CULL_EVERY``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.compress_min_length = options.get('COMPRESS_MIN_LENGTH', 1024)
+        self.cull_every = options.get('CULL_EVERY', 100)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # a forked worker must not share the parent's connection
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                'value BLOB NOT NULL, expires REAL) WITHOUT ROWID')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def encode(self, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) >= self.compress_min_length:
+            return COMPRESSED + zlib.compress(data)
+        return PLAIN + data
+
+    @staticmethod
+    def decode(blob):
+        data = blob[1:]
+        if blob[:1] == COMPRESSED:
+            data = zlib.decompress(data)
+        return pickle.loads(data)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()])
+        return {keys[key]: self.decode(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        return bool(self.get_many([key], version=version))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._key(key, version), self.encode(value), expires)
+                for key, value in data.items()]
+        with self.connection as connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', rows)
+        if random.randrange(self.cull_every) == 0:
+            self.cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store only if the key is missing or expired, atomically."""
+        cursor = self.connection.execute(
+            'INSERT INTO cache VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE '
+            'SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            [self._key(key, version), self.encode(value),
+             self.get_backend_timeout(timeout), time.time()])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Add ``delta`` to a stored number, atomically across processes."""
+        key = self._key(key, version)
+        with self.connection as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self.decode(row[0]) + delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               [self.encode(value), key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()])
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        cursor = self.connection.execute('DELETE FROM cache WHERE key = ?',
+                                         [self._key(key, version)])
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        with self.connection as connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                [(self._key(key, version),) for key in keys])
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def cull(self):
+        """Drop expired rows, then the soonest to expire over the limit."""
+        connection = self.connection
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           [time.time()])
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and not self._cull_frequency:
+            self.clear()
+        elif count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count // self._cull_frequency])
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, lock_timeout=10,
+                   cache=default_cache):
+    """``cache.get_or_set()`` where only one caller recomputes a miss.
+
+    The first caller to miss takes a lock key with ``cache.add()`` and
+    runs ``compute``; the others poll for its result for up to
+    ``lock_timeout`` seconds instead of all hitting the database at once,
+    then give up and compute it themselves.
+    """
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+    return compute()
@@ -0,0 +1,82 @@
+"""Counters summed over every process through the ``METRICS_CACHE``.
+
+A gunicorn scrape reaches one worker, so totals kept in a process would
+jump between workers. ``SharedCounters`` adds to local deltas instead
+and, at most every ``METRICS_FLUSH`` seconds and before every read,
+moves them to cache keys with ``cache.incr()``, atomic in memcached,
+locmem and ``SQLiteCache``. Reads sum the requests of all processes,
+minus those another process has not flushed yet. Counters are integers;
+the labels every process has flushed are listed under one cache key.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class SharedCounters:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._seen = set()
+        self._flushed = time.monotonic()
+
+    @property
+    def cache(self):
+        return caches[settings.METRICS_CACHE]
+
+    @property
+    def labels_key(self):
+        return f'{self.prefix}:labels'
+
+    def key(self, labels):
+        return ':'.join((self.prefix, *map(str, labels)))
+
+    def add(self, counts):
+        """Add ``{labels tuple: amount}`` to the counters."""
+        with self._lock:
+            for labels, amount in counts.items():
+                self._pending[labels] += amount
+            due = time.monotonic() - self._flushed >= settings.METRICS_FLUSH
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._flushed = time.monotonic()
+            self._seen.update(pending)
+            seen = set(self._seen)
+        cache = self.cache
+        for labels, amount in pending.items():
+            key = self.key(labels)
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                # culled between the two calls
+                cache.add(key, amount, None)
+        # a lost concurrent update or a cull is repaired on the next flush
+        listed = set(cache.get(self.labels_key, ()))
+        if not seen <= listed:
+            cache.set(self.labels_key, sorted(listed | seen), None)
+
+    def values(self):
+        """``{labels tuple: total}`` of every process."""
+        self.flush()
+        labels = [tuple(labels)
+                  for labels in self.cache.get(self.labels_key, ())]
+        keys = {self.key(labels): labels for labels in labels}
+        found = self.cache.get_many(keys)
+        return {labels: found.get(key, 0) for key, labels in keys.items()}
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._seen.clear()
+        keys = [self.key(labels)
+                for labels in self.cache.get(self.labels_key, ())]
+        self.cache.delete_many(keys + [self.labels_key])
@@ -0,0 +1,185 @@
+"""Static and media files served by the WSGI application, before Django.
+
+``FileServer`` wraps the Django application and answers requests under
+``STATIC_URL`` and ``MEDIA_URL`` straight from the disk: no middleware,
+URL resolving or view runs for an asset. Files are sent with the
+server's ``wsgi.file_wrapper`` (``sendfile()`` under gunicorn), single
+byte ranges are honoured, and a precompressed ``.br`` or ``.gz`` sibling
+written by ``yatube.staticfiles`` is sent to clients accepting it.
+
+Names carrying a content hash, hashed static files and post image blobs,
+are cached for a year as immutable; other files for
+``FILE_SERVER_MAX_AGE`` seconds, revalidated with ETag and
+Last-Modified. ``MEDIA_ROOT/originals/`` is never served.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.utils.http import http_date, parse_http_date_safe
+
+from posts.storage import is_blob
+
+HASHED = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Content-Encoding -> file extension, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+TEXT_TYPES = ('application/javascript', 'application/json', 'image/svg+xml')
+CHUNK_SIZE = 64 * 1024
+
+
+def ranged(file, length):
+    """Read ``length`` bytes of ``file`` from where it is, in chunks."""
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def byte_range(header, size):
+    """``(start, end)`` of a single ``Range`` header, ``None`` to ignore it.
+
+    Raise ``ValueError`` for a range outside the file.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end) if end else size - 1, size - 1)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class FileServer:
+    def __init__(self, application, roots=None, max_age=None):
+        self.application = application
+        # (URL prefix, directory, hidden subdirectories)
+        self.roots = roots or [
+            (settings.STATIC_URL, settings.STATIC_ROOT, ()),
+            (settings.MEDIA_URL, settings.MEDIA_ROOT, ('originals/',)),
+        ]
+        self.max_age = (settings.FILE_SERVER_MAX_AGE if max_age is None
+                        else max_age)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        for prefix, root, hidden in self.roots:
+            if path.startswith(prefix):
+                return self.serve(environ, start_response, root,
+                                  path[len(prefix):], hidden)
+        return self.application(environ, start_response)
+
+    def serve(self, environ, start_response, root, name, hidden):
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed',
+                           [('Allow', 'GET, HEAD')])
+            return []
+        name = name.encode('iso-8859-1').decode('utf-8', 'replace')
+        path = self.find(root, name, hidden)
+        if path is None:
+            start_response('404 Not Found',
+                           [('Content-Type', 'text/plain; charset=utf-8')])
+            return [b'Not Found']
+        encoding, sent = self.variant(environ, path)
+        stat = os.stat(sent)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{encoding or ""}"'
+        headers = self.headers(name, path, stat, etag, encoding)
+        if self.not_modified(environ, etag, stat.st_mtime):
+            start_response('304 Not Modified', headers)
+            return []
+        return self.send(environ, start_response, sent, stat.st_size,
+                         headers, etag)
+
+    def find(self, root, name, hidden):
+        """Path of the file ``name`` in ``root``, ``None`` if not servable."""
+        parts = [part for part in name.split('/') if part not in ('', '.')]
+        if '..' in parts or '\x00' in name:
+            return None
+        if '/'.join(parts).startswith(hidden):
+            return None
+        root = os.path.realpath(root)
+        path = os.path.realpath(os.path.join(root, *parts))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def variant(self, environ, path):
+        """``(Content-Encoding, file)`` to send, the encoding may be None."""
+        if environ.get('HTTP_RANGE'):
+            # ranges address the plain file
+            return None, path
+        accepted = {
+            value.split(';')[0].strip() for value in
+            environ.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+        for encoding, extension in ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + extension):
+                return encoding, path + extension
+        return None, path
+
+    def headers(self, name, path, stat, etag, encoding):
+        content_type, _ = mimetypes.guess_type(name)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in TEXT_TYPES:
+            content_type += '; charset=utf-8'
+        immutable = HASHED.search(name) or is_blob(name)
+        headers = [
+            ('Content-Type', content_type),
+            ('Cache-Control', IMMUTABLE if immutable
+             else f'public, max-age={self.max_age}'),
+            ('ETag', etag),
+            ('Last-Modified', http_date(stat.st_mtime)),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if any(os.path.isfile(path + extension)
+               for _, extension in ENCODINGS):
+            headers.append(('Vary', 'Accept-Encoding'))
+        return headers
+
+    @staticmethod
+    def not_modified(environ, etag, mtime):
+        if 'HTTP_IF_NONE_MATCH' in environ:
+            tags = [tag.strip() for tag in
+                    environ['HTTP_IF_NONE_MATCH'].split(',')]
+            return etag in tags or '*' in tags
+        since = parse_http_date_safe(environ.get('HTTP_IF_MODIFIED_SINCE'))
+        return since is not None and int(mtime) <= since
+
+    def send(self, environ, start_response, path, size, headers, etag):
+        try:
+            span = byte_range(environ.get('HTTP_RANGE', ''), size)
+        except ValueError:
+            start_response('416 Range Not Satisfiable',
+                           [('Content-Range', f'bytes */{size}')])
+            return []
+        if span and environ.get('HTTP_IF_RANGE', etag) != etag:
+            span = None
+        status, length = '200 OK', size
+        if span:
+            status, length = '206 Partial Content', span[1] - span[0] + 1
+            headers.append(('Content-Range',
+                            f'bytes {span[0]}-{span[1]}/{size}'))
+        headers.append(('Content-Length', str(length)))
+        start_response(status, headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(path, 'rb')
+        if span:
+            file.seek(span[0])
+            return ranged(file, length)
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, CHUNK_SIZE)
+        return ranged(file, length)
@@ -0,0 +1,284 @@
+"""Per-request timing and query instrumentation.
+
+``RequestMetricsMiddleware`` records for every request the resolved view
+name, total time, database time, query count, repeated queries, template
+render time and cache hits and misses. Totals per view are summed over
+every process in the shared cache (``yatube.counters``) and served in the
+Prometheus text format by ``prometheus``; a
+``REQUEST_METRICS_SAMPLE_RATE`` share of requests is also appended to
+``REQUEST_METRICS_FILE`` as JSON lines, and requests slower than
+``REQUEST_METRICS_SLOW_MS`` are logged with their SQL.
+
+Queries are only timed and referenced while a request runs, everything
+else is done once per request, so the middleware can stay on in
+production.
+"""
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import HttpResponse
+from django.template.base import Template
+from django.utils.crypto import constant_time_compare
+
+from . import ratelimit
+from .counters import SharedCounters
+
+logger = logging.getLogger('yatube.requests')
+
+# upper bounds of the request duration histogram, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+COUNTERS = ('requests', 'seconds', 'db_seconds', 'queries',
+            'duplicate_queries', 'template_seconds', 'cache_hits',
+            'cache_misses')
+# shared counters are integers, seconds are kept in microseconds
+SECONDS = ('seconds', 'db_seconds', 'template_seconds')
+
+_local = threading.local()
+_lock = threading.Lock()
+_counters = SharedCounters('metrics:requests')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = '<unresolved>'
+        self.queries = []
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+
+    def record_query(self, sql, params, duration):
+        self.queries.append((sql, params, duration))
+        self.db_seconds += duration
+
+    def duplicate_queries(self):
+        """Queries run again with the same SQL and parameters."""
+        unique = {(sql, repr(params)) for sql, params, _ in self.queries}
+        return len(self.queries) - len(unique)
+
+    def as_dict(self, status, seconds):
+        return {
+            'view': self.view,
+            'status': status,
+            'seconds': seconds,
+            'db_seconds': self.db_seconds,
+            'queries': len(self.queries),
+            'duplicate_queries': self.duplicate_queries(),
+            'template_seconds': self.template_seconds,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    """Metrics of the request running in this thread, if any."""
+    return getattr(_local, 'metrics', None)
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, params, time.perf_counter() - started)
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        metrics = current()
+        if metrics is None or metrics.template_depth:
+            return render(self, context)
+        # only the outermost template, includes are part of its time
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            metrics.template_seconds += time.perf_counter() - started
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get(get):
+    missing = object()
+
+    def wrapper(self, key, default=None, version=None):
+        metrics = current()
+        if metrics is None or metrics.cache_depth:
+            return get(self, key, default, version)
+        # a backend may implement get() with get_many(), count it once
+        metrics.cache_depth += 1
+        try:
+            value = get(self, key, missing, version)
+        finally:
+            metrics.cache_depth -= 1
+        if value is missing:
+            metrics.cache_misses += 1
+        else:
+            metrics.cache_hits += 1
+        return default if value is missing else value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        metrics = current()
+        if metrics is None or metrics.cache_depth:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        # and the default get_many() goes through get()
+        metrics.cache_depth += 1
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            metrics.cache_depth -= 1
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install():
+    """Hook template rendering and the configured cache backends once."""
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _timed_render(Template.render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _counted_get(backend.get)
+        if not getattr(backend.get_many, 'instrumented', False):
+            backend.get_many = _counted_get_many(backend.get_many)
+
+
+def record(metrics, response):
+    seconds = time.perf_counter() - metrics.started
+    report = metrics.as_dict(response.status_code, seconds)
+    bucket = next((index for index, bound in enumerate(BUCKETS)
+                   if seconds <= bound), len(BUCKETS))
+    counts = {('total', metrics.view, 'requests'): 1,
+              ('bucket', metrics.view, str(bucket)): 1}
+    for name in COUNTERS[1:]:
+        value = report[name]
+        if name in SECONDS:
+            value = round(value * 1e6)
+        counts['total', metrics.view, name] = value
+    _counters.add(counts)
+    if seconds * 1000 >= settings.REQUEST_METRICS_SLOW_MS:
+        log_slow_request(metrics, report)
+    if (settings.REQUEST_METRICS_FILE
+            and random.random() < settings.REQUEST_METRICS_SAMPLE_RATE):
+        export(report)
+    return report
+
+
+def log_slow_request(metrics, report):
+    statements = '\n'.join(
+        f'  {duration * 1000:.1f} ms  {sql}  {params!r}'
+        for sql, params, duration in metrics.queries)
+    logger.warning(
+        'Slow request %(view)s: %(seconds).3f s, %(queries)d queries in '
+        '%(db_seconds).3f s, templates %(template_seconds).3f s', report,
+        extra={'metrics': report})
+    if statements:
+        logger.warning('SQL of %s:\n%s', report['view'], statements)
+
+
+def export(report):
+    line = json.dumps({'time': time.time(), **report})
+    with _lock, open(settings.REQUEST_METRICS_FILE, 'a') as exported:
+        exported.write(line + '\n')
+
+
+def reset():
+    _counters.clear()
+
+
+def prometheus_text():
+    """Totals of every process in the Prometheus text exposition format.
+    """
+    totals, histograms = {}, {}
+    for (kind, view, name), value in _counters.values().items():
+        if kind == 'bucket':
+            histograms.setdefault(view, [0] * (len(BUCKETS) + 1))[
+                int(name)] = value
+        else:
+            totals.setdefault(view, dict.fromkeys(COUNTERS, 0))[name] = (
+                value / 1e6 if name in SECONDS else value)
+    lines = []
+    for name in COUNTERS:
+        metric = f'yatube_request_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.extend(f'{metric}{{view="{view}"}} {values[name]}'
+                     for view, values in sorted(totals.items()))
+    metric = 'yatube_request_duration_seconds'
+    lines.append(f'# TYPE {metric} histogram')
+    for view, counts in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), counts):
+            cumulative += count
+            lines.append(
+                f'{metric}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{view="{view}"}} '
+                     f'{totals.get(view, {}).get("seconds", 0)}')
+        lines.append(f'{metric}_count{{view="{view}"}} {cumulative}')
+    lines.extend(ratelimit.prometheus_lines())
+    return '\n'.join(lines) + '\n'
+
+
+def prometheus(request):
+    """Prometheus scrape endpoint, open to staff and to requests bearing
+    ``METRICS_TOKEN``."""
+    token = request.META.get('HTTP_AUTHORIZATION', '')
+    scraper = settings.METRICS_TOKEN and constant_time_compare(
+        token, f'Bearer {settings.METRICS_TOKEN}')
+    if not (scraper or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(prometheus_text(),
+                        content_type='text/plain; version=0.0.4')
+
+
+class RequestMetricsMiddleware:
+    """Collect ``RequestMetrics`` for every request, see module docstring.
+
+    Put it first in ``MIDDLEWARE`` so that the time of the other
+    middleware is counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics()
+        wrappers = [connection.execute_wrapper(_query_wrapper)
+                    for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            _local.metrics = None
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            metrics.view = match.view_name
+        request.metrics = record(metrics, response)
+        return response
@@ -0,0 +1,150 @@
+"""Rate limits of the write views.
+
+``rate_limit('add_comment')`` gives the view one counter per user and
+one per IP address, sized by ``RATE_LIMITS['add_comment']``: ``(burst,
+period)`` lets ``burst`` requests through in any ``period`` seconds. The
+count over the last period is estimated from the counters of the
+current and the previous ``period`` long windows (a sliding window
+counter), kept in the ``RATE_LIMIT_CACHE`` cache and shared by every
+process. Counters only change with ``cache.add()`` and ``cache.incr()``,
+so concurrent requests never share a slot: the backend's ``incr()``
+must be atomic, as memcached's, locmem's and ``SQLiteCache``'s are.
+
+The decorator goes on top of the view: the user comes from the session,
+so a rejected request costs no database query. Allowed and rejected
+requests are counted per endpoint over every process
+(``yatube.counters``) and served by ``/metrics/``.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .counters import SharedCounters
+
+RESULTS = ('allowed', 'rejected')
+
+_counters = SharedCounters('metrics:ratelimit')
+
+
+def limit_keys(endpoint, request):
+    """``{cache key: (burst, period)}`` of the limits ``request`` is under.
+    """
+    limits = settings.RATE_LIMITS.get(endpoint, {})
+    keys = {}
+    user_id = request.session.get(SESSION_KEY)
+    if 'user' in limits and user_id is not None:
+        keys[f'ratelimit:{endpoint}:user:{user_id}'] = limits['user']
+    address = request.META.get('REMOTE_ADDR')
+    if 'ip' in limits and address:
+        keys[f'ratelimit:{endpoint}:ip:{address}'] = limits['ip']
+    return keys
+
+
+def increment(cache, key, timeout):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # expired between the two calls
+        cache.add(key, 0, timeout)
+        return cache.incr(key)
+
+
+def retry_after(before, count, burst, period, elapsed):
+    """Seconds until a window holding ``count`` requests, after one of
+    ``before``, ``elapsed`` seconds ago lets one more through."""
+    if count > burst:
+        # not before the next window, where ``count`` is the one before
+        return period - elapsed + period * max(
+            0, 1 - (burst - 1) / max(count - 1, 1))
+    return period * (1 - (burst - count) / before) - elapsed
+
+
+def take(keys, now=None):
+    """Count a request against every limit of ``keys``.
+
+    Return 0 if it is within all of them, or the seconds until it would
+    be and count it against none.
+    """
+    if not keys:
+        return 0
+    now = time.time() if now is None else now
+    cache = caches[settings.RATE_LIMIT_CACHE]
+    windows = {}
+    for key, (burst, period) in keys.items():
+        index, elapsed = divmod(now, period)
+        windows[key] = (f'{key}:{index:.0f}', f'{key}:{index - 1:.0f}',
+                        elapsed)
+    previous = cache.get_many([last for _, last, _ in windows.values()])
+    wait = 0
+    for key, (burst, period) in keys.items():
+        current, last, elapsed = windows[key]
+        count = increment(cache, current, math.ceil(2 * period))
+        before = previous.get(last, 0)
+        if before * (1 - elapsed / period) + count > burst:
+            wait = max(wait, retry_after(before, count, burst, period,
+                                         elapsed))
+    if wait:
+        for current, _, _ in windows.values():
+            try:
+                cache.decr(current)
+            except ValueError:
+                pass
+    return wait
+
+
+def count(endpoint, result):
+    _counters.add({(endpoint, result): 1})
+
+
+def counts():
+    totals = {}
+    for (endpoint, result), value in _counters.values().items():
+        totals.setdefault(endpoint, dict.fromkeys(RESULTS, 0))[result] = value
+    return totals
+
+
+def reset():
+    _counters.clear()
+
+
+def prometheus_lines():
+    metric = 'yatube_rate_limit_requests_total'
+    lines = [f'# TYPE {metric} counter']
+    for endpoint, values in sorted(counts().items()):
+        lines.extend(
+            f'{metric}{{endpoint="{endpoint}",result="{result}"}} '
+            f'{values[result]}' for result in RESULTS)
+    return lines
+
+
+def too_many_requests(wait):
+    response = HttpResponse('Слишком много запросов, попробуйте позже.',
+                            content_type='text/plain; charset=utf-8',
+                            status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def rate_limit(endpoint, methods=('POST',)):
+    """Limit ``methods`` requests of the view by ``RATE_LIMITS[endpoint]``,
+    answering 429 with ``Retry-After`` over the limit."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.RATE_LIMIT_ENABLED
+                    or request.method not in methods):
+                return view(request, *args, **kwargs)
+            wait = take(limit_keys(endpoint, request))
+            if wait:
+                count(endpoint, 'rejected')
+                return too_many_requests(wait)
+            count(endpoint, 'allowed')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,64 @@
+"""Read replicas for safe requests.
+
+``ReplicaMiddleware`` lets the reads of ``GET`` and ``HEAD`` requests go
+to a random alias of ``settings.DB_REPLICAS``. Everything else stays on
+the primary: unsafe requests, atomic blocks, code outside requests, and
+requests of a user who wrote less than ``DB_REPLICA_PIN_SECONDS`` ago.
+The last rule is a cookie set on the response of any request that wrote,
+so users see their own posts and comments before replication catches up.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'use_primary'
+
+_state = threading.local()
+
+
+def replica_allowed():
+    return getattr(_state, 'replica_allowed', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not settings.DB_REPLICAS or not replica_allowed()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DB_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # reads of the rest of the request must see this write
+        _state.replica_allowed = False
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DB_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Put it above every middleware that reads the database."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica_allowed = (request.method in ('GET', 'HEAD')
+                                  and PIN_COOKIE not in request.COOKIES)
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.replica_allowed = _state.wrote = False
+        if wrote and settings.DB_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', httponly=True,
+                                max_age=settings.DB_REPLICA_PIN_SECONDS,
+                                samesite='Lax')
+        return response
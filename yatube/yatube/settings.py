@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.RequestMetricsMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +87,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Configured from DB_* environment variables, SQLite in the project
+# directory by default. DB_CONN_MAX_AGE keeps a connection per worker
+# thread open between requests, which is the pool of a threaded server;
+# for a pool shared between processes put PgBouncer in front of
+# PostgreSQL and set DB_DISABLE_SERVER_SIDE_CURSORS=1.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'yatube.sqlite')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS')),
+        'OPTIONS': {},
     }
 }
 
+if DB_ENGINE == 'yatube.sqlite':
+    # WAL and tuned pragmas, writers queue for up to DB_BUSY_TIMEOUT
+    # seconds, see yatube/sqlite/base.py
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': float(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+# Read replicas of the default database, comma separated in DB_REPLICAS:
+# file names for SQLite (filled by the sync_replicas command), hosts for
+# database servers. GET requests read from them unless the user wrote
+# less than DB_REPLICA_PIN_SECONDS ago, see yatube/routers.py.
+DB_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME' if 'sqlite' in DB_ENGINE else 'HOST': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(alias)
+
+DB_REPLICA_PIN_SECONDS = 10
+
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -149,10 +195,168 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# collectstatic stores static files under content-hashed names too and
+# writes .gz (and .br, with the brotli package) copies of the text ones
+STATICFILES_STORAGE = 'yatube.staticfiles.CompressedManifestStorage'
+
+# Serve STATIC_URL and MEDIA_URL from the WSGI application ahead of Django
+# (yatube/fileserver.py); set FILE_SERVER=0 behind a web server serving
+# them itself. Files without a content hash in their name are cached for
+# FILE_SERVER_MAX_AGE seconds.
+FILE_SERVER = os.environ.get('FILE_SERVER', '1') == '1'
+FILE_SERVER_MAX_AGE = 60 * 60
+
 POSTS_PER_PAGE = 10
 
+COMMENTS_PER_PAGE = 20
+
+# 'cursor' for keyset pages (?cursor=), 'numbered' for ?page=N
+POSTS_PAGINATION = 'cursor'
+
+# Numbered pages: seconds to cache a feed's post count, and table size from
+# which unfiltered feeds use the database row estimate instead of COUNT(*)
+PAGINATOR_COUNT_TIMEOUT = 60
+PAGINATOR_ESTIMATE_THRESHOLD = 100000
+
+# Follow feed: 'read' joins Follow on every request, 'write' pushes new
+# posts into bounded per-follower timelines (run rebuild_timelines after
+# switching). Authors with more followers than FOLLOW_FEED_FANOUT_LIMIT
+# are still merged in at read time.
+FOLLOW_FEED_STRATEGY = 'read'
+FOLLOW_FEED_SIZE = 500
+FOLLOW_FEED_FANOUT_LIMIT = 10000
+
+# Threads rendering post thumbnails in the background, 0 leaves it to the
+# generate_thumbnails command
+POST_THUMBNAIL_WORKERS = 2
+
+# Side effects of writes (counters, search index, timelines) go through
+# the database task queue in posts/queue.py. TASKS_MODE 'thread' runs them
+# in a thread of every web process, 'workers' leaves them to
+# `manage.py run_workers`, 'eager' runs them inside the request (tests).
+# Workers look for due tasks every TASKS_POLL seconds, take a task over
+# from a worker silent for TASKS_LEASE seconds and delete finished tasks
+# after TASKS_KEEP_DONE seconds.
+TASKS_MODE = os.environ.get('TASKS_MODE', 'thread')
+TASKS_POLL = 1.0
+TASKS_LEASE = 5 * 60
+TASKS_KEEP_DONE = 24 * 60 * 60
+
+# Images uploaded with a post: the original is kept under
+# MEDIA_ROOT/originals/, which must not be served as it still carries the
+# EXIF metadata, and posts show a copy re-encoded to POST_IMAGE_FORMAT
+# ('WEBP' or 'JPEG'), at most POST_IMAGE_MAX_SIDE pixels on a side and
+# POST_IMAGE_MAX_BYTES. POST_IMAGE_WORKERS processes re-encode in the
+# background, 0 re-encodes during the request. Uploads over the size or
+# pixel limits are refused before they are decoded.
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_MAX_SIDE = 1600
+POST_IMAGE_MAX_BYTES = 300 * 1024
+POST_IMAGE_QUALITY = 80
+POST_IMAGE_WORKERS = 2
+POST_IMAGE_KEEP_ORIGINALS = True
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# Post images are stored once per content (posts/storage.py). Blobs no
+# post refers to are deleted by collect_blobs once older than this many
+# seconds, so uploads of posts being saved are left alone
+MEDIA_BLOB_GC_GRACE = 24 * 60 * 60
+
+# Stream every upload to a temporary file rather than memory, storage then
+# moves it into place instead of copying
+FILE_UPLOAD_MAX_MEMORY_SIZE = 0
+
+# Seconds index, group and profile pages are served from the cache to
+# anonymous visitors before one request regenerates them (the others get
+# the stale page meanwhile), see posts/caching.py
+VIEW_CACHE_TIMEOUT = 20
+
+# Dotted path to a posts.search.SearchBackend subclass, None picks SQLite
+# FTS5 when the index table exists and a LIKE scan otherwise
+POSTS_SEARCH_BACKEND = None
+
+# Cache shared by every worker process. CACHE_BACKEND picks 'sqlite' (a
+# file next to the database, no services needed), 'file', 'redis' (needs
+# django-redis), 'memcached' or 'locmem'; CACHE_LOCATION overrides the
+# file, directory or server address. Bump CACHE_VERSION to drop every
+# key at once after a deploy that changes cached HTML or data.
+CACHE_BACKENDS = {
+    'sqlite': {
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 50000, 'COMPRESS_MIN_LENGTH': 1024},
+    },
+    'file': {
+        # pickles are always zlib-compressed by this backend
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'OPTIONS': {
+            'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+        },
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.environ.get('CACHE_VERSION', 1)),
     }
 }
+
+if os.environ.get('CACHE_LOCATION'):
+    CACHES['default']['LOCATION'] = os.environ['CACHE_LOCATION']
+
+# Sessions are read from the cache, so the rate limits below know the user
+# without a database query
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Rate limits of the write views (yatube/ratelimit.py): per endpoint, a
+# user and an IP address may each send `burst` requests in any `period`
+# seconds, as (burst, period). Requests over the limit are answered 429;
+# /metrics/ counts them per endpoint.
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMITS = {
+    'new_post': {'user': (5, 10 * 60), 'ip': (20, 10 * 60)},
+    'post_edit': {'user': (20, 10 * 60), 'ip': (60, 10 * 60)},
+    'add_comment': {'user': (10, 60), 'ip': (30, 60)},
+    'profile_follow': {'user': (20, 60), 'ip': (60, 60)},
+    'profile_unfollow': {'user': (20, 60), 'ip': (60, 60)},
+    'signup': {'ip': (5, 60 * 60)},
+}
+
+# Request instrumentation (yatube.metrics): share of requests appended to
+# REQUEST_METRICS_FILE as JSON lines (None turns the export off), and the
+# duration from which a request is logged with its SQL. /metrics/ serves
+# the totals to staff and to scrapers sending
+# `Authorization: Bearer <METRICS_TOKEN>`; the client address proves
+# nothing behind the proxy. Totals are summed over the worker processes in
+# the METRICS_CACHE cache (yatube/counters.py): each adds its counts there
+# once METRICS_FLUSH seconds have passed since it last did, and before it
+# answers a scrape.
+REQUEST_METRICS_SAMPLE_RATE = 0.01
+REQUEST_METRICS_FILE = None
+REQUEST_METRICS_SLOW_MS = 500
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_CACHE = 'default'
+METRICS_FLUSH = 10.0
+
+# Runs the tests with queued tasks run at once, no rate limits and a cache
+# of their own
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
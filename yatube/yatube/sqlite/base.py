@@ -0,0 +1,41 @@
+"""SQLite backend tuned for a web server with concurrent writers.
+
+Extra ``OPTIONS`` on top of the stock backend:
+
+* ``pragmas``, run on every new connection. The defaults switch the file
+  to WAL, so readers never wait for the writer, and relax ``synchronous``
+  to ``NORMAL``, which is durable in WAL mode except on power loss.
+* ``transaction_mode``, how ``atomic()`` begins a transaction. With
+  ``IMMEDIATE`` a writer takes the lock up front and waits out the busy
+  timeout (the stock ``timeout`` option) instead of failing with
+  "database is locked" when it reads first and upgrades to a write later.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,67 @@
+"""Static files storage writing precompressed copies at collectstatic.
+
+Files get content-hashed names from ``ManifestStaticFilesStorage``, so
+they can be cached forever, and every text file gets ``.gz`` and, when
+the ``brotli`` package is installed, ``.br`` siblings for
+``yatube.fileserver`` to send to clients accepting them.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.html', '.txt', '.json',
+                '.xml', '.ico', '.eot', '.otf', '.ttf')
+MIN_SIZE = 256
+# a compressed copy must save at least this share of the file
+MIN_SAVING = 0.05
+
+
+def compressors():
+    yield '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+def write_compressed(path):
+    """Write the worthwhile compressed copies of ``path``, return them."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < MIN_SIZE:
+        return []
+    written = []
+    for extension, compress in compressors():
+        compressed = compress(data)
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + extension, 'wb') as file:
+                file.write(compressed)
+            written.append(path + extension)
+    return written
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if isinstance(hashed_name, str):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in names:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                write_compressed(self.path(name))
+
+    def stored_name(self, name):
+        # templates rendered before the first collectstatic, tests among
+        # them, link the plain name instead of failing
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
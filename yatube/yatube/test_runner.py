@@ -0,0 +1,29 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+TEST_SETTINGS = {
+    # the tests see the effects of queued tasks at once
+    'TASKS_MODE': 'eager',
+    # rate limit buckets would outlive the test database
+    'RATE_LIMIT_ENABLED': False,
+    # never the site's cache file, and no test run shares another's cache
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_PREFIX': 'yatube',
+        }
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests with ``TEST_SETTINGS`` applied."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,18 +1,27 @@
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf.urls import handler404, handler500
 from django.conf import settings
 from django.conf.urls.static import static
 
+from posts import blobs
+
+from .metrics import prometheus
+
 handler404 = "posts.views.page_not_found"
 handler500 = "posts.views.server_error"
 
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('metrics/', prometheus, name='metrics'),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
     path('', include('posts.urls')),
     path('admin/admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
+    # content-addressed images never change, browsers may keep them
+    re_path(r'^{}(?P<path>.+/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.\w+)?)$'.format(
+        settings.MEDIA_URL.lstrip('/')), blobs.serve, name='blob'),
 ]
 
 if settings.DEBUG: